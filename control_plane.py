@@ -0,0 +1,367 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from src.utils.event_bus import Event, RESET_EVENT
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem garantia de envio único entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# embedded: o primeiro processo do Flask que obtiver o lock de envio executa
+# o agendador e os demais o controlam pelo socket; external: o agendador roda
+# em um processo próprio (`python -m src.worker`) e o Flask só o controla.
+# Com servidores WSGI de vários processos (gunicorn, uWSGI), prefira external:
+# os envios não dependem de qual processo do servidor está vivo
+SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'embedded').lower()
+
+# Arquivos no diretório de dados: socket de controle e lock do processo que envia
+CONTROL_SOCKET_NAME = 'scheduler.sock'
+SENDER_LOCK_NAME = 'scheduler.lock'
+
+# Tempo máximo de espera por uma resposta do agendador (segundos)
+CONTROL_TIMEOUT_SECONDS = 30
+
+# Intervalo das linhas vazias que mantêm aberta uma assinatura de eventos (segundos)
+CONTROL_KEEPALIVE_SECONDS = 15
+
+# Comandos aceitos pelo socket de controle (métodos de TelegramBotService)
+CONTROL_COMMANDS = (
+    'start_bot', 'stop_bot', 'start_all_bots', 'stop_all_bots', 'status',
+    'refresh_changes', 'notify_posts_changed', 'send_now',
+)
+
+
+class SchedulerUnavailableError(Exception):
+    """O processo do agendador não respondeu pelo socket de controle"""
+
+
+class SchedulerCommandError(Exception):
+    """O comando chegou ao agendador, mas falhou dentro do serviço"""
+
+
+class SenderLock:
+    """Lock exclusivo do processo que executa o agendador (e, portanto, envia as publicações).
+
+    Enquanto o processo dono estiver vivo, nenhum outro obtém o lock; o
+    sistema operacional o libera quando o processo termina, mesmo que ele
+    morra sem encerrar. O arquivo guarda o PID do dono, para diagnóstico.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        """Tenta obter o lock sem bloquear; retorna True se este processo é o dono"""
+        if self.file is not None:
+            return True
+        if fcntl is None:
+            logger.warning("Lock de envio indisponível nesta plataforma; execute um único processo do agendador")
+            self.file = True
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self.file = lock_file
+        return True
+
+    def owner_pid(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+
+def _send_json(conn, payload):
+    conn.sendall(json.dumps(payload, default=str).encode() + b'\n')
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Uma requisição JSON por conexão: {"cmd": ..., "args": [...]}"""
+
+    def handle(self):
+        service = self.server.service
+        try:
+            request = json.loads(self.rfile.readline() or b'{}')
+            command, args = request.get('cmd'), request.get('args') or []
+            if command == 'subscribe':
+                self._stream_events(service, *args)
+                return
+            if command == 'ping':
+                result = {'pid': os.getpid()}
+            elif command in CONTROL_COMMANDS:
+                result = getattr(service, command)(*args)
+            else:
+                raise ValueError(f"Comando desconhecido: {command}")
+            _send_json(self.connection, {'ok': True, 'result': result})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            logger.error(f"Erro no comando de controle: {e}")
+            try:
+                _send_json(self.connection, {'ok': False, 'error': str(e)})
+            except OSError:
+                pass
+
+    def _stream_events(self, service, last_event_id=None):
+        """Repassa os eventos de entrega até o cliente desconectar"""
+        subscription = service.subscribe_events(last_event_id)
+        try:
+            while True:
+                event = subscription.get(timeout=CONTROL_KEEPALIVE_SECONDS)
+                if event is None:
+                    # Linha vazia: detecta clientes que já desconectaram
+                    self.connection.sendall(b'\n')
+                    continue
+                _send_json(self.connection, {'id': event.id, 'type': event.type, 'data': event.data})
+                if event.type == RESET_EVENT:
+                    return
+        except OSError:
+            pass
+        finally:
+            subscription.close()
+
+
+class _ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Socket Unix pelo qual os processos do Flask controlam o agendador local"""
+
+    def __init__(self, service, socket_path):
+        self.service = service
+        self.socket_path = socket_path
+        self.server = None
+
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            logger.warning("Sockets Unix indisponíveis; o agendador só pode ser controlado por este processo")
+            return False
+        # Só o dono do lock de envio inicia o servidor: um socket existente é de um dono anterior
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = _ControlServer(self.socket_path, _ControlHandler)
+        self.server.service = self.service
+        threading.Thread(target=self.server.serve_forever, name='scheduler-control', daemon=True).start()
+        logger.info(f"Controle do agendador disponível em {self.socket_path}")
+        return True
+
+    def close(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class RemoteSubscription:
+    """Assinatura de eventos do agendador remoto, com a mesma interface de `Subscription`"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = b''
+
+    def get(self, timeout=None):
+        """Próximo evento, ou None se nada chegar dentro de `timeout`.
+
+        Se a conexão cair (o agendador reiniciou), retorna um `reset`.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            line, separator, rest = self.buffer.partition(b'\n')
+            if separator:
+                self.buffer = rest
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                return Event(message['id'], message['type'], message['data'])
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return None
+            self.conn.settimeout(remaining)
+            try:
+                chunk = self.conn.recv(65536)
+            except socket.timeout:
+                return None
+            except OSError:
+                chunk = b''
+            if not chunk:
+                return Event(None, RESET_EVENT, {'reason': 'unavailable'})
+            self.buffer += chunk
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+class ControlClient:
+    """Controla pelo socket o agendador executado em outro processo.
+
+    Tem a interface de TelegramBotService usada pelas rotas; cada chamada
+    abre uma conexão e lança SchedulerUnavailableError se o agendador não
+    responder ou SchedulerCommandError se o comando falhar no serviço.
+    """
+
+    def __init__(self, socket_path, timeout=CONTROL_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.timeout)
+        try:
+            conn.connect(self.socket_path)
+        except OSError as e:
+            conn.close()
+            raise SchedulerUnavailableError(f"Agendador indisponível em {self.socket_path}: {e}") from e
+        return conn
+
+    def _call(self, command, *args):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise SchedulerUnavailableError("Sockets Unix indisponíveis nesta plataforma")
+        conn = self._connect()
+        try:
+            _send_json(conn, {'cmd': command, 'args': list(args)})
+            with conn.makefile('rb') as reader:
+                line = reader.readline()
+        except OSError as e:
+            raise SchedulerUnavailableError(f"Agendador não respondeu ao comando {command}: {e}") from e
+        finally:
+            conn.close()
+        if not line:
+            raise SchedulerUnavailableError(f"Agendador encerrou a conexão no comando {command}")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise SchedulerCommandError(response.get('error') or f"Falha no comando {command}")
+        return response['result']
+
+    def ping(self):
+        return self._call('ping')
+
+    def start_bot(self, bot_id):
+        return self._call('start_bot', bot_id)
+
+    def stop_bot(self, bot_id):
+        return self._call('stop_bot', bot_id)
+
+    def start_all_bots(self):
+        return self._call('start_all_bots')
+
+    def stop_all_bots(self):
+        return self._call('stop_all_bots')
+
+    def status(self, since=None):
+        return self._call('status', since)
+
+    def refresh_changes(self):
+        return self._call('refresh_changes')
+
+    def send_now(self, post_id):
+        return self._call('send_now', post_id)
+
+    def notify_posts_changed(self, bot_ids=None):
+        """Avisa o agendador; se ele estiver fora do ar, as publicações são relidas quando ele voltar"""
+        try:
+            self._call('notify_posts_changed', list(bot_ids) if bot_ids is not None else None)
+        except SchedulerUnavailableError as e:
+            logger.warning(f"Alteração não notificada: {e}")
+
+    def resume_active_bots(self):
+        """Nada a fazer: o processo do agendador retoma os bots ativos ao iniciar"""
+        return 0
+
+    def subscribe_events(self, last_event_id=None):
+        conn = self._connect()
+        try:
+            _send_json(conn, {'cmd': 'subscribe', 'args': [last_event_id]})
+        except OSError as e:
+            conn.close()
+            raise SchedulerUnavailableError(f"Agendador indisponível em {self.socket_path}: {e}") from e
+        return RemoteSubscription(conn)
+
+
+class SchedulerHandle:
+    """Acesso do Flask ao agendador, local ou em outro processo.
+
+    Garante um único processo enviando publicações: na primeira chamada, o
+    processo tenta obter o lock de envio (modo embedded) e, se conseguir,
+    executa o agendador e abre o socket de controle para os demais
+    processos; caso contrário, ou no modo external, encaminha as chamadas
+    pelo socket. Enquanto for cliente, volta a tentar o lock a cada chamada,
+    assumindo os envios (e retomando os bots ativos) se o dono anterior terminar.
+
+    Um processo criado por fork (servidores WSGI que carregam a aplicação
+    antes de criar os workers) não herda o agendador do pai: começa como
+    cliente e disputa o lock como qualquer outro.
+    """
+
+    def __init__(self, data_dir, mode=SCHEDULER_MODE):
+        self.data_dir = data_dir
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.sender_lock = SenderLock(os.path.join(data_dir, SENDER_LOCK_NAME))
+        self.client = ControlClient(os.path.join(data_dir, CONTROL_SOCKET_NAME))
+        self.service = None
+        self.server = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # As threads do agendador não existem no filho; os descritores herdados
+        # do lock e do socket são fechados para não prendê-los depois que o pai terminar
+        if self.sender_lock.file not in (None, True):
+            self.sender_lock.file.close()
+        if self.server is not None and self.server.server is not None:
+            self.server.server.socket.close()
+        self.lock = threading.Lock()
+        self.sender_lock = SenderLock(self.sender_lock.path)
+        self.service = None
+        self.server = None
+
+    def _target(self):
+        with self.lock:
+            if self.service is None and self.mode != 'external' and self.sender_lock.acquire():
+                from src.telegram_bot_service import TelegramBotService
+                self.service = TelegramBotService(self.data_dir)
+                self.server = ControlServer(self.service, self.client.socket_path)
+                self.server.start()
+                # Quem assume os envios retoma os bots marcados como ativos
+                threading.Thread(target=self.service.resume_active_bots, name='scheduler-resume',
+                                 daemon=True).start()
+            return self.service if self.service is not None else self.client
+
+    @property
+    def is_local(self):
+        """Indica se este processo executa o agendador"""
+        return self._target() is self.service
+
+    def start(self):
+        """Tenta assumir os envios já, sem esperar a primeira chamada; retorna `is_local`"""
+        return self.is_local
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
@@ -35,10 +35,11 @@ data_dir = initialize_data_files()
 from flask import Flask, render_template, redirect, url_for
 # Importações absolutas que funcionam tanto em execução direta quanto como módulo
 from src.routes.post_routes import post_bp
-from src.routes.bot_routes import bot_bp, load_bots
-from src.routes.bot_control_routes import bot_control_bp
+from src.routes.bot_routes import bot_bp
+from src.routes.bot_control_routes import bot_control_bp, bot_service
 from src.routes.auth_routes import auth_bp
-from src.telegram_bot_service import TelegramBotService
+from src.utils.lookups import get_bot_name
+from src.utils.media_library import reconcile_media_index
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
@@ -49,16 +50,19 @@ app.register_blueprint(bot_bp)
 app.register_blueprint(bot_control_bp)
 app.register_blueprint(auth_bp)
 
+# Incluir no índice da biblioteca de mídia os arquivos alterados fora da aplicação
+reconcile_media_index()
+
+# Servidores WSGI importam este módulo sem executar o bloco __main__: cada
+# processo tenta assumir os envios (e retomar os bots ativos) já ao carregar a
+# aplicação, e os demais ficam como clientes. Para vários processos, o
+# recomendado é SCHEDULER_MODE=external com `python -m src.worker` à parte.
+if __name__ != '__main__':
+    bot_service.start()
+
 # Adicionar função auxiliar para templates
 @app.context_processor
 def utility_processor():
-    def get_bot_name(bot_id):
-        if not bot_id:
-            return None
-        bots = load_bots()
-        bot = next((b for b in bots if b.id == bot_id), None)
-        return bot.name if bot else None
-    
     return dict(get_bot_name=get_bot_name)
 
 # Rota principal
@@ -67,11 +71,13 @@ def index():
     return redirect(url_for('posts.index'))
 
 if __name__ == '__main__':
-    # Inicializar o serviço do bot
-    bot_service = TelegramBotService(data_dir)
-    
     # Imprimir informações de inicialização
     print(f"Diretório de dados: {data_dir}")
     print(f"Arquivos inicializados com sucesso")
     
+    # Assumir os envios e retomar os bots ativos, a menos que outro processo
+    # já execute o agendador; com o reloader do modo debug, apenas no processo filho
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and bot_service.is_local:
+        print("Agendador iniciado neste processo")
+    
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,8 +1,14 @@
 from datetime import datetime
+from src.models.fields import Raw, lazy_datetime
 
 class Bot:
+    __slots__ = ('id', 'name', 'token', 'default_groups', 'is_active', '_created_at', '_updated_at', 'rev')
+    
+    created_at = lazy_datetime()
+    updated_at = lazy_datetime()
+    
     def __init__(self, id=None, name=None, token=None, default_groups=None, 
-                 is_active=False, created_at=None, updated_at=None):
+                 is_active=False, created_at=None, updated_at=None, rev=0):
         self.id = id
         self.name = name
         self.token = token
@@ -10,6 +16,7 @@ class Bot:
         self.is_active = is_active
         self.created_at = created_at or datetime.now()
         self.updated_at = updated_at or datetime.now()
+        self.rev = rev  # Revisão do registro, incrementada a cada gravação
     
     def to_dict(self):
         return {
@@ -18,8 +25,9 @@ class Bot:
             'token': self.token,
             'default_groups': self.default_groups,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': type(self).created_at.dump(self),
+            'updated_at': type(self).updated_at.dump(self),
+            'rev': self.rev
         }
     
     @classmethod
@@ -30,6 +38,7 @@ class Bot:
             token=data.get('token'),
             default_groups=data.get('default_groups', []),
             is_active=data.get('is_active', False),
-            created_at=datetime.fromisoformat(data.get('created_at')) if data.get('created_at') else None,
-            updated_at=datetime.fromisoformat(data.get('updated_at')) if data.get('updated_at') else None
+            created_at=Raw(data['created_at']) if data.get('created_at') else None,
+            updated_at=Raw(data['updated_at']) if data.get('updated_at') else None,
+            rev=data.get('rev', 0)
         )
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+
+class Raw:
+    """Valor ainda na forma lida do arquivo, convertido apenas no primeiro acesso"""
+
+    __slots__ = ('args',)
+
+    def __init__(self, *args):
+        self.args = args
+
+
+class LazyField:
+    """Atributo de modelo com conversão adiada.
+
+    O valor fica no slot `_<nome>`. `from_dict` guarda ali um `Raw` com os
+    dados do arquivo; a conversão (`parse`) roda no primeiro acesso e o
+    resultado substitui o `Raw`. `dump` devolve o valor serializável,
+    usando `dump_raw` para evitar a conversão de ida e volta quando o
+    atributo nunca foi lido.
+    """
+
+    def __init__(self, parse, serialize, dump_raw=None):
+        self.parse = parse
+        self.serialize = serialize
+        self.dump_raw = dump_raw
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = f"_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if type(value) is Raw:
+            value = self.parse(*value.args)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+    def dump(self, obj):
+        value = getattr(obj, self.slot)
+        if type(value) is Raw:
+            if self.dump_raw is not None:
+                return self.dump_raw(*value.args)
+            value = self.__get__(obj)
+        return self.serialize(value)
+
+
+def parse_datetime(value):
+    """Converte um timestamp ISO; valores inválidos viram None em vez de impedir a carga do arquivo"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def serialize_datetime(value):
+    return value.isoformat() if value else None
+
+
+def lazy_datetime():
+    """Timestamp ISO convertido em datetime apenas quando lido"""
+    return LazyField(parse_datetime, serialize_datetime, dump_raw=lambda value: value or None)
+
+
+def bumps_revision(model, fields):
+    """Indica se alterar os campos `fields` incrementa a revisão (`rev`) do registro.
+
+    Os campos de `model.UNVERSIONED_FIELDS`, gravados pelo agendador (ex.:
+    resultado dos envios), não contam: não invalidam a revisão vista por um
+    formulário de edição aberto, que altera outros campos.
+    """
+    return not set(fields) <= getattr(model, 'UNVERSIONED_FIELDS', frozenset())
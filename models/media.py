@@ -0,0 +1,53 @@
+import os
+
+class MediaFile:
+    """Entrada do índice da biblioteca de mídia (um arquivo em static/uploads)"""
+
+    __slots__ = ('id', 'type', 'size', 'mtime', 'width', 'height', 'original_name', 'sha256', 'library', 'rev')
+
+    def __init__(self, id=None, type=None, size=0, mtime=0, width=None, height=None,
+                 original_name=None, sha256=None, library=False, rev=0):
+        self.id = id  # nome do arquivo dentro da pasta de uploads
+        self.type = type  # 'photo' ou 'video'
+        self.size = size  # em bytes
+        self.mtime = mtime  # data de modificação do arquivo (timestamp)
+        self.width = width
+        self.height = height
+        self.original_name = original_name  # nome do arquivo no primeiro envio
+        self.sha256 = sha256
+        self.library = library  # enviado à biblioteca: não é excluído junto com as publicações
+        self.rev = rev  # Revisão do registro, incrementada a cada gravação
+
+    @property
+    def path(self):
+        """Caminho relativo usado como media_url nas publicações"""
+        return os.path.join('static', 'uploads', self.id)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'size': self.size,
+            'mtime': self.mtime,
+            'width': self.width,
+            'height': self.height,
+            'original_name': self.original_name,
+            'sha256': self.sha256,
+            'library': self.library,
+            'rev': self.rev
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data.get('id'),
+            type=data.get('type'),
+            size=data.get('size', 0),
+            mtime=data.get('mtime', 0),
+            width=data.get('width'),
+            height=data.get('height'),
+            original_name=data.get('original_name'),
+            sha256=data.get('sha256'),
+            library=data.get('library', False),
+            rev=data.get('rev', 0)
+        )
@@ -1,11 +1,59 @@
+import re
 from datetime import datetime
+from src.models.fields import LazyField, Raw, lazy_datetime
+
+# Identificadores de chat válidos: ID numérico (grupos são negativos) ou @username
+CHAT_ID_PATTERN = re.compile(r'^(-?\d+|@\w+)$')
+
+
+def parse_groups(text):
+    """Converte o texto informado no formulário (vírgulas ou quebras de linha) em lista de grupos"""
+    return [group for group in re.split(r'[\s,;]+', text or '') if group]
+
+
+def compact_send_status(send_status, send_history=None):
+    """Resumo do último resultado por grupo, sem chaves inválidas.
+
+    Registros antigos guardavam o ID da última mensagem em `send_history`;
+    ele é incorporado ao resumo para a deleção automática continuar funcionando.
+    """
+    compact = {chat_id: dict(status) for chat_id, status in (send_status or {}).items()
+               if CHAT_ID_PATTERN.match(chat_id) and isinstance(status, dict)}
+    for chat_id, history in (send_history or {}).items():
+        if chat_id not in compact or not isinstance(history, dict):
+            continue
+        if history.get('status') == 'success' and 'message_id' in history:
+            compact[chat_id].setdefault('message_id', history['message_id'])
+            if history.get('deleted'):
+                compact[chat_id].setdefault('deleted', True)
+    return compact
+
+
+def _dump_send_status(send_status, send_history=None):
+    # Sem histórico antigo para incorporar, o resumo lido pode ser gravado como está
+    if not send_history and all(CHAT_ID_PATTERN.match(chat_id) for chat_id in (send_status or {})):
+        return send_status or {}
+    return compact_send_status(send_status, send_history)
+
 
 class Post:
+    __slots__ = ('id', 'bot_id', 'media_type', 'media_url', 'caption', 'button_text', 'button_url',
+                 'interval_seconds', 'groups', '_created_at', '_updated_at', '_last_sent',
+                 '_send_status', 'auto_delete', 'user_id', 'active', 'click_count', 'rev')
+    
+    # Resultado dos envios: gravado pelo agendador sem alterar a revisão da publicação
+    UNVERSIONED_FIELDS = frozenset({'send_status', 'last_sent'})
+    
+    created_at = lazy_datetime()
+    updated_at = lazy_datetime()
+    last_sent = lazy_datetime()  # Timestamp do último envio
+    # Último resultado de envio por grupo (inclui o ID da mensagem)
+    send_status = LazyField(compact_send_status, lambda value: value, dump_raw=_dump_send_status)
+    
     def __init__(self, id=None, bot_id=None, media_type=None, media_url=None, caption=None, 
                  button_text=None, button_url=None, interval_seconds=None, 
                  groups=None, created_at=None, updated_at=None, last_sent=None, 
-                 send_status=None, auto_delete=False, user_id=None, active=True, click_count=0,
-                 send_history=None):
+                 send_status=None, auto_delete=False, user_id=None, active=True, click_count=0, rev=0):
         self.id = id
         self.bot_id = bot_id  # ID do bot que enviará esta publicação
         self.media_type = media_type  # 'photo', 'video' ou 'text'
@@ -17,15 +65,47 @@ class Post:
         self.groups = groups or []
         self.created_at = created_at or datetime.now()
         self.updated_at = updated_at or datetime.now()
-        self.last_sent = last_sent  # Timestamp do último envio
-        self.send_status = send_status or {}  # Status de envio para cada grupo
+        self.last_sent = last_sent
+        self.send_status = send_status or {}
         self.auto_delete = auto_delete  # Opção para deletar automaticamente a última publicação antes de enviar nova
         self.user_id = user_id  # ID do usuário que criou a publicação
         self.active = active  # Se a publicação está ativa para envio
         self.click_count = click_count  # Contador de cliques na publicação
-        self.send_history = send_history or {}  # Histórico de envios com IDs das mensagens para deleção
+        self.rev = rev  # Revisão do registro, incrementada a cada gravação (usada como ETag)
+    
+    def prune_send_status(self, groups):
+        """Descarta o resumo de grupos que não fazem mais parte do envio"""
+        targets = {str(group) for group in groups}
+        self.send_status = {chat_id: status for chat_id, status in self.send_status.items() if chat_id in targets}
+    
+    def status_summary(self):
+        """Contagem dos últimos resultados por status e o status geral da publicação.
+        
+        O status geral é 'never' (nunca enviada), 'failed' (algum grupo
+        falhou), 'retrying' (algum grupo aguarda nova tentativa) ou 'success'.
+        """
+        counts = {}
+        for status in self.send_status.values():
+            counts[status.get('status')] = counts.get(status.get('status'), 0) + 1
+        if not counts:
+            overall = 'never'
+        elif counts.get('failed'):
+            overall = 'failed'
+        elif counts.get('retrying'):
+            overall = 'retrying'
+        else:
+            overall = 'success'
+        return {'status': overall, 'groups': counts}
+    
+    def to_summary_dict(self):
+        """Versão para listagens: sem o status de cada grupo, apenas o resumo"""
+        data = self.to_dict()
+        del data['send_status']
+        data['status_summary'] = self.status_summary()
+        return data
     
     def to_dict(self):
+        cls = type(self)
         return {
             'id': self.id,
             'bot_id': self.bot_id,
@@ -36,36 +116,37 @@ class Post:
             'button_url': self.button_url,
             'interval_seconds': self.interval_seconds,
             'groups': self.groups,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'last_sent': self.last_sent.isoformat() if self.last_sent else None,
-            'send_status': self.send_status,
+            'created_at': cls.created_at.dump(self),
+            'updated_at': cls.updated_at.dump(self),
+            'last_sent': cls.last_sent.dump(self),
+            'send_status': cls.send_status.dump(self),
             'auto_delete': self.auto_delete,
             'user_id': self.user_id,
             'active': self.active,
             'click_count': self.click_count,
-            'send_history': self.send_history
+            'rev': self.rev
         }
     
     @classmethod
     def from_dict(cls, data):
-        return cls(
-            id=data.get('id'),
-            bot_id=data.get('bot_id'),
-            media_type=data.get('media_type'),
-            media_url=data.get('media_url'),
-            caption=data.get('caption'),
-            button_text=data.get('button_text'),
-            button_url=data.get('button_url'),
-            interval_seconds=data.get('interval_seconds'),
-            groups=data.get('groups', []),
-            created_at=datetime.fromisoformat(data.get('created_at')) if data.get('created_at') else None,
-            updated_at=datetime.fromisoformat(data.get('updated_at')) if data.get('updated_at') else None,
-            last_sent=datetime.fromisoformat(data.get('last_sent')) if data.get('last_sent') else None,
-            send_status=data.get('send_status', {}),
-            auto_delete=data.get('auto_delete', False),
-            user_id=data.get('user_id'),
-            active=data.get('active', True),
-            click_count=data.get('click_count', 0),
-            send_history=data.get('send_history', {})
-        )
+        """Cria a publicação sem converter timestamps e status; a conversão ocorre no primeiro acesso"""
+        post = cls.__new__(cls)
+        post.id = data.get('id')
+        post.bot_id = data.get('bot_id')
+        post.media_type = data.get('media_type')
+        post.media_url = data.get('media_url')
+        post.caption = data.get('caption')
+        post.button_text = data.get('button_text')
+        post.button_url = data.get('button_url')
+        post.interval_seconds = data.get('interval_seconds')
+        post.groups = data.get('groups') or []
+        post._created_at = Raw(data['created_at']) if data.get('created_at') else datetime.now()
+        post._updated_at = Raw(data['updated_at']) if data.get('updated_at') else datetime.now()
+        post._last_sent = Raw(data['last_sent']) if data.get('last_sent') else None
+        post._send_status = Raw(data.get('send_status'), data.get('send_history'))
+        post.auto_delete = data.get('auto_delete', False)
+        post.user_id = data.get('user_id')
+        post.active = data.get('active', True)
+        post.click_count = data.get('click_count', 0)
+        post.rev = data.get('rev', 0)
+        return post
@@ -1,9 +1,15 @@
 from datetime import datetime
+from src.models.fields import Raw, lazy_datetime
 import uuid
 import hashlib
 
 class User:
-    def __init__(self, id=None, username=None, password=None, is_admin=False, post_limit=None, created_at=None, updated_at=None):
+    __slots__ = ('id', 'username', 'password', 'is_admin', 'post_limit', '_created_at', '_updated_at', 'rev')
+    
+    created_at = lazy_datetime()
+    updated_at = lazy_datetime()
+    
+    def __init__(self, id=None, username=None, password=None, is_admin=False, post_limit=None, created_at=None, updated_at=None, rev=0):
         self.id = id or str(uuid.uuid4())
         self.username = username
         self.password = password  # Deve ser armazenado como hash
@@ -11,6 +17,7 @@ class User:
         self.post_limit = post_limit  # Limite de publicações que o usuário pode criar
         self.created_at = created_at or datetime.now()
         self.updated_at = updated_at or datetime.now()
+        self.rev = rev  # Revisão do registro, incrementada a cada gravação
     
     def to_dict(self):
         return {
@@ -19,8 +26,9 @@ class User:
             'password': self.password,
             'is_admin': self.is_admin,
             'post_limit': self.post_limit,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': type(self).created_at.dump(self),
+            'updated_at': type(self).updated_at.dump(self),
+            'rev': self.rev
         }
     
     @classmethod
@@ -31,8 +39,9 @@ class User:
             password=data.get('password'),
             is_admin=data.get('is_admin', False),
             post_limit=data.get('post_limit'),
-            created_at=datetime.fromisoformat(data.get('created_at')) if data.get('created_at') else None,
-            updated_at=datetime.fromisoformat(data.get('updated_at')) if data.get('updated_at') else None
+            created_at=Raw(data['created_at']) if data.get('created_at') else None,
+            updated_at=Raw(data['updated_at']) if data.get('updated_at') else None,
+            rev=data.get('rev', 0)
         )
     
     @staticmethod
@@ -1,61 +1,36 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, session, flash
-import json
-import os
-import uuid
 from datetime import datetime
 import hashlib
 from functools import wraps
 from src.models.user import User
+from src.storage import get_storage
+from src.utils.lookups import get_user
 
 auth_bp = Blueprint('auth', __name__)
 
-DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'users.json')
+users_repo = get_storage().users
 
-# Garantir que o diretório de dados exista
-os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-
-# Garantir que o arquivo de usuários exista
-if not os.path.exists(DATA_FILE):
-    # Criar o arquivo com o usuário administrador padrão
+def create_default_admin():
+    """Cria o usuário administrador padrão"""
     admin_user = User(
         username="eliasndr",
         password=hashlib.sha256("1408Masp@".encode()).hexdigest(),
         is_admin=True,
         post_limit=None  # Sem limite para o administrador
     )
-    with open(DATA_FILE, 'w') as f:
-        json.dump([admin_user.to_dict()], f, indent=2)
-    print(f"Arquivo de usuários criado com administrador padrão: {DATA_FILE}")
+    users_repo.upsert(admin_user)
+    print("Usuário administrador padrão criado")
+    return admin_user
+
+# Garantir que exista ao menos o administrador padrão
+if users_repo.count() == 0:
+    create_default_admin()
 
 def load_users():
-    try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-            return [User.from_dict(user_data) for user_data in data]
-    except Exception as e:
-        print(f"Erro ao carregar usuários: {e}")
-        # Se houver erro, retorna lista vazia e recria o arquivo com admin padrão
-        admin_user = User(
-            username="eliasndr",
-            password=hashlib.sha256("1408Masp@".encode()).hexdigest(),
-            is_admin=True,
-            post_limit=None
-        )
-        with open(DATA_FILE, 'w') as f:
-            json.dump([admin_user.to_dict()], f, indent=2)
-        return [admin_user]
+    return users_repo.all()
 
 def save_users(users):
-    try:
-        # Garantir que o diretório exista antes de salvar
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        
-        with open(DATA_FILE, 'w') as f:
-            json.dump([user.to_dict() for user in users], f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erro ao salvar usuários: {e}")
-        return False
+    return users_repo.save_all(users)
 
 def login_required(f):
     @wraps(f)
@@ -71,8 +46,7 @@ def admin_required(f):
         if 'user_id' not in session:
             return redirect(url_for('auth.login', next=request.url))
         
-        users = load_users()
-        user = next((u for u in users if u.id == session['user_id']), None)
+        user = get_user(session['user_id'])
         
         if not user or not user.is_admin:
             flash('Acesso negado. Você precisa ser administrador para acessar esta página.', 'danger')
@@ -94,8 +68,7 @@ def login():
         # Hash da senha para comparação
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
-        users = load_users()
-        user = next((u for u in users if u.username == username and u.password == password_hash), None)
+        user = next((u for u in users_repo.find_by('username', username) if u.password == password_hash), None)
         
         if user:
             session['user_id'] = user.id
@@ -137,8 +110,7 @@ def create_user():
             return render_template('auth/create_user.html')
         
         # Verificar se o usuário já existe
-        users = load_users()
-        if any(u.username == username for u in users):
+        if users_repo.find_by('username', username):
             flash('Este nome de usuário já está em uso.', 'danger')
             return render_template('auth/create_user.html')
         
@@ -159,8 +131,7 @@ def create_user():
             post_limit=post_limit
         )
         
-        users.append(new_user)
-        save_users(users)
+        users_repo.upsert(new_user)
         
         flash('Usuário criado com sucesso!', 'success')
         return redirect(url_for('auth.list_users'))
@@ -170,8 +141,7 @@ def create_user():
 @auth_bp.route('/users/<user_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_user(user_id):
-    users = load_users()
-    user = next((u for u in users if u.id == user_id), None)
+    user = users_repo.get(user_id)
     
     if not user:
         flash('Usuário não encontrado.', 'danger')
@@ -188,31 +158,26 @@ def edit_user(user_id):
             return render_template('auth/edit_user.html', user=user)
         
         # Verificar se o novo nome de usuário já existe (se foi alterado)
-        if username != user.username and any(u.username == username for u in users):
+        if username != user.username and users_repo.find_by('username', username):
             flash('Este nome de usuário já está em uso.', 'danger')
             return render_template('auth/edit_user.html', user=user)
         
-        # Atualizar usuário
-        for i, u in enumerate(users):
-            if u.id == user_id:
-                users[i].username = username
-                
-                # Atualizar senha apenas se fornecida
-                if password:
-                    users[i].password = hashlib.sha256(password.encode()).hexdigest()
-                
-                users[i].is_admin = is_admin
-                
-                # Converter post_limit para inteiro ou None
-                if post_limit and post_limit.isdigit():
-                    users[i].post_limit = int(post_limit)
-                else:
-                    users[i].post_limit = None
-                
-                users[i].updated_at = datetime.now()
-                break
-        
-        save_users(users)
+        # Atualizar usuário (apenas os campos do formulário, sem alterar o objeto em cache)
+        changes = {
+            'username': username,
+            'is_admin': is_admin,
+            # Converter post_limit para inteiro ou None
+            'post_limit': int(post_limit) if post_limit and post_limit.isdigit() else None,
+            'updated_at': datetime.now()
+        }
+        
+        # Atualizar senha apenas se fornecida
+        if password:
+            changes['password'] = hashlib.sha256(password.encode()).hexdigest()
+        
+        if users_repo.patch(user_id, changes) is None:
+            flash('Erro ao atualizar usuário.', 'danger')
+            return render_template('auth/edit_user.html', user=user)
         
         flash('Usuário atualizado com sucesso!', 'success')
         return redirect(url_for('auth.list_users'))
@@ -227,9 +192,7 @@ def delete_user(user_id):
         flash('Você não pode excluir seu próprio usuário.', 'danger')
         return redirect(url_for('auth.list_users'))
     
-    users = load_users()
-    users = [u for u in users if u.id != user_id]
-    save_users(users)
+    users_repo.delete(user_id)
     
     flash('Usuário excluído com sucesso!', 'success')
     return redirect(url_for('auth.list_users'))
@@ -1,13 +1,24 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for
 import os
-from src.telegram_bot_service import TelegramBotService
+from src.control_plane import SchedulerHandle, SchedulerCommandError, SchedulerUnavailableError
+from src.utils.http_cache import conditional_json
 from src.routes.bot_routes import load_bots
 
 bot_control_bp = Blueprint('bot_control', __name__, url_prefix='/bot')
 
-# Inicializar o serviço do bot
+# Acesso ao agendador: executado neste processo ou, se outro já envia, controlado pelo socket
 data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-bot_service = TelegramBotService(data_dir)
+bot_service = SchedulerHandle(data_dir)
+
+@bot_control_bp.app_errorhandler(SchedulerUnavailableError)
+def scheduler_unavailable(error):
+    """O processo do agendador não está respondendo"""
+    return jsonify({"success": False, "message": str(error)}), 503
+
+@bot_control_bp.app_errorhandler(SchedulerCommandError)
+def scheduler_command_failed(error):
+    """O agendador recebeu o comando, mas ele falhou"""
+    return jsonify({"success": False, "message": str(error)}), 500
 
 @bot_control_bp.route('/start/<bot_id>', methods=['POST'])
 def start_bot(bot_id):
@@ -43,5 +54,11 @@ def stop_all_bots():
 
 @bot_control_bp.route('/status', methods=['GET'])
 def bot_status():
-    """Retorna o status atual dos bots"""
-    return jsonify(bot_service.status())
+    """Retorna o status atual dos bots.
+    
+    Responde 304 se nada mudou desde a versão enviada em If-None-Match;
+    com `?since=<version>`, retorna apenas o que mudou desde essa versão.
+    """
+    since = request.args.get('since')
+    version = bot_service.refresh_changes()
+    return conditional_json(version, lambda: bot_service.status(since))
@@ -1,45 +1,19 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for
-import json
-import os
 import uuid
 from datetime import datetime
 from src.models.bot import Bot
+from src.models.post import parse_groups
+from src.storage import get_storage
 
 bot_bp = Blueprint('bots', __name__, url_prefix='/bots')
 
-DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'bots.json')
-
-# Garantir que o diretório de dados exista
-os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-
-# Garantir que o arquivo de bots exista
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, 'w') as f:
-        json.dump([], f)
+bots_repo = get_storage().bots
 
 def load_bots():
-    try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-            return [Bot.from_dict(bot_data) for bot_data in data]
-    except Exception as e:
-        print(f"Erro ao carregar bots: {e}")
-        # Se houver erro, retorna lista vazia e recria o arquivo
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
-        return []
+    return bots_repo.all()
 
 def save_bots(bots):
-    try:
-        # Garantir que o diretório exista antes de salvar
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        
-        with open(DATA_FILE, 'w') as f:
-            json.dump([bot.to_dict() for bot in bots], f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erro ao salvar bots: {e}")
-        return False
+    return bots_repo.save_all(bots)
 
 @bot_bp.route('/')
 def index():
@@ -52,7 +26,7 @@ def create():
         data = request.form.to_dict()
         
         # Processar grupos como lista
-        default_groups = [group.strip() for group in data.get('default_groups', '').split(',') if group.strip()]
+        default_groups = parse_groups(data.get('default_groups', ''))
         
         bot = Bot(
             id=str(uuid.uuid4()),
@@ -62,9 +36,7 @@ def create():
             is_active=False
         )
         
-        bots = load_bots()
-        bots.append(bot)
-        save_bots(bots)
+        bots_repo.upsert(bot)
         
         return redirect(url_for('bots.index'))
     
@@ -72,8 +44,7 @@ def create():
 
 @bot_bp.route('/<bot_id>', methods=['GET'])
 def view(bot_id):
-    bots = load_bots()
-    bot = next((b for b in bots if b.id == bot_id), None)
+    bot = bots_repo.get(bot_id)
     
     if not bot:
         return redirect(url_for('bots.index'))
@@ -82,8 +53,7 @@ def view(bot_id):
 
 @bot_bp.route('/<bot_id>/edit', methods=['GET', 'POST'])
 def edit(bot_id):
-    bots = load_bots()
-    bot = next((b for b in bots if b.id == bot_id), None)
+    bot = bots_repo.get(bot_id)
     
     if not bot:
         return redirect(url_for('bots.index'))
@@ -92,39 +62,27 @@ def edit(bot_id):
         data = request.form.to_dict()
         
         # Processar grupos como lista
-        default_groups = [group.strip() for group in data.get('default_groups', '').split(',') if group.strip()]
+        default_groups = parse_groups(data.get('default_groups', ''))
         
-        for i, b in enumerate(bots):
-            if b.id == bot_id:
-                bots[i].name = data.get('name')
-                bots[i].token = data.get('token')
-                bots[i].default_groups = default_groups
-                bots[i].updated_at = datetime.now()
-                break
-        
-        save_bots(bots)
+        bots_repo.patch(bot_id, {
+            'name': data.get('name'),
+            'token': data.get('token'),
+            'default_groups': default_groups,
+            'updated_at': datetime.now()
+        })
         return redirect(url_for('bots.index'))
     
     return render_template('bots/edit.html', bot=bot)
 
 @bot_bp.route('/<bot_id>/delete', methods=['POST'])
 def delete(bot_id):
-    bots = load_bots()
-    bots = [b for b in bots if b.id != bot_id]
-    save_bots(bots)
+    bots_repo.delete(bot_id)
     return redirect(url_for('bots.index'))
 
 @bot_bp.route('/<bot_id>/toggle_status', methods=['POST'])
 def toggle_status(bot_id):
-    bots = load_bots()
-    
-    for i, bot in enumerate(bots):
-        if bot.id == bot_id:
-            bots[i].is_active = not bots[i].is_active
-            bots[i].updated_at = datetime.now()
-            break
-    
-    save_bots(bots)
+    # Alternar sobre o valor atual do registro, sob o lock do repositório
+    bots_repo.patch(bot_id, lambda bot: {'is_active': not bot.is_active, 'updated_at': datetime.now()})
     return redirect(url_for('bots.index'))
 
 @bot_bp.route('/api/list', methods=['GET'])
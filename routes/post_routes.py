@@ -1,53 +1,102 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
-import json
-import os
+from flask import Blueprint, Response, render_template, request, jsonify, redirect, url_for, flash, session, send_file
 import uuid
 from datetime import datetime
-from src.models.post import Post
+from src.models.post import Post, parse_groups
 from src.routes.bot_routes import load_bots
 from src.routes.auth_routes import login_required
-from src.utils.file_upload import save_uploaded_file, delete_file, get_media_list
+from src.routes.bot_control_routes import bot_service
+from src.storage import ConflictError, get_storage
+from src.utils.file_upload import save_uploaded_file, delete_file, media_references, release_media
+from src.utils.media_library import media_index, query_media
+from src.utils.thumbnails import find_thumbnail
+from src.utils import chunked_upload
+from src.utils.chunked_upload import UploadError
+from src.utils.pagination import paginate, parse_page_size
+from src.utils.http_cache import conditional_json
+from src.utils.event_bus import RESET_EVENT, format_sse
+from src.utils.lookups import get_bot_name, get_user
 
 post_bp = Blueprint('posts', __name__)
 
-DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'posts.json')
+posts_repo = get_storage().posts
+delivery_log = get_storage().deliveries
 
-# Garantir que o diretório de dados exista
-os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+# Intervalo entre os comentários que mantêm o stream de eventos aberto (segundos)
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
 
-# Garantir que o arquivo de posts exista
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, 'w') as f:
-        json.dump([], f)
+# Espera sugerida ao navegador antes de reconectar o stream (milissegundos)
+EVENT_STREAM_RETRY_MS = 3000
+
+# Tempo que o navegador pode reutilizar uma miniatura sem revalidar (segundos)
+MEDIA_THUMBNAIL_MAX_AGE = 24 * 60 * 60
 
 def load_posts():
-    try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-            return [Post.from_dict(post_data) for post_data in data]
-    except Exception as e:
-        print(f"Erro ao carregar posts: {e}")
-        # Se houver erro, retorna lista vazia e recria o arquivo
-        with open(DATA_FILE, 'w') as f:
-            json.dump([], f)
-        return []
+    return posts_repo.all()
 
 def save_posts(posts):
+    return posts_repo.save_all(posts)
+
+def expected_revision(data):
+    """Revisão da publicação vista pelo cliente (campo `rev` do formulário ou If-Match), se informada"""
+    value = data.get('rev')
+    if not value and request.if_match and not request.if_match.star_tag:
+        value = next(iter(request.if_match.as_set()), None)
     try:
-        # Garantir que o diretório exista antes de salvar
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        
-        with open(DATA_FILE, 'w') as f:
-            json.dump([post.to_dict() for post in posts], f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erro ao salvar posts: {e}")
-        return False
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+# Ordenações aceitas na listagem: {nome: função que extrai a chave}
+POST_SORT_KEYS = {
+    'created_at': lambda post: Post.created_at.dump(post) or '',
+    'updated_at': lambda post: Post.updated_at.dump(post) or '',
+    'last_sent': lambda post: Post.last_sent.dump(post) or '',
+    'interval': lambda post: post.interval_seconds or 0,
+}
+
+def query_posts(args):
+    """Página de publicações visíveis ao usuário, conforme os filtros da query string.
+    
+    Filtros: `bot_id`, `active` (true/false) e `status` (status geral do
+    último envio: never, success, retrying ou failed). Ordenação por `sort`
+    (um dos POST_SORT_KEYS, com prefixo '-' para decrescente) e paginação
+    por `cursor` e `limit`. Retorna (página, próximo cursor, total filtrado).
+    """
+    user_id = session.get('user_id')
+    is_admin = session.get('is_admin', False)
+    
+    # Usar o índice mais seletivo disponível
+    bot_id = args.get('bot_id') or None
+    if bot_id:
+        posts = posts_repo.find_by('bot_id', bot_id)
+        if not is_admin:
+            posts = [post for post in posts if post.user_id == user_id]
+    else:
+        posts = load_posts() if is_admin else posts_repo.find_by('user_id', user_id)
+    
+    active = (args.get('active') or '').lower()
+    if active in ('true', 'false'):
+        posts = [post for post in posts if bool(post.active) == (active == 'true')]
+    
+    status = args.get('status') or None
+    if status:
+        posts = [post for post in posts if post.status_summary()['status'] == status]
+    
+    sort = args.get('sort') or 'created_at'
+    descending = sort.startswith('-')
+    sort_key = POST_SORT_KEYS.get(sort.lstrip('-'), POST_SORT_KEYS['created_at'])
+    
+    page, next_cursor = paginate(posts, sort_key, cursor=args.get('cursor'),
+                                 limit=parse_page_size(args.get('limit')), descending=descending)
+    return page, next_cursor, len(posts)
+
+def notify_scheduler(*bot_ids):
+    """Avisa o agendador dos bots afetados para recarregar as publicações"""
+    bot_service.notify_posts_changed([bot_id for bot_id in set(bot_ids) if bot_id])
 
 @post_bp.route('/')
 @login_required
 def index():
-    posts = load_posts()
     bots = load_bots()
     
     # Filtrar posts pelo usuário atual, exceto para admin
@@ -59,34 +108,38 @@ def index():
     user_post_count = 0
     
     if not is_admin:
-        posts = [post for post in posts if post.user_id == user_id]
-        
         # Obter limite de publicações do usuário
-        from src.routes.auth_routes import load_users
-        users = load_users()
-        user = next((u for u in users if u.id == user_id), None)
+        user = get_user(user_id)
         
         if user:
             user_post_limit = user.post_limit
-            user_post_count = len(posts)
+            user_post_count = posts_repo.count_by('user_id', user_id)
+    
+    posts, next_cursor, total_posts = query_posts(request.args)
+    filters = {key: request.args.get(key, '') for key in ('bot_id', 'active', 'status', 'sort', 'limit')}
+    next_page_url = None
+    if next_cursor:
+        next_page_url = url_for('posts.index', cursor=next_cursor, **{key: value for key, value in filters.items() if value})
     
     return render_template('index.html', posts=posts, bots=bots, 
                           user_post_limit=user_post_limit, 
-                          user_post_count=user_post_count)
+                          user_post_count=user_post_count,
+                          next_page_url=next_page_url,
+                          total_posts=total_posts,
+                          filters=filters)
 
 @post_bp.route('/posts', methods=['GET'])
 @login_required
 def get_posts():
-    posts = load_posts()
+    """Lista paginada das publicações do usuário (todas para admin); ver `query_posts`"""
+    posts, next_cursor, total = query_posts(request.args)
     
-    # Filtrar posts pelo usuário atual, exceto para admin
-    user_id = session.get('user_id')
-    is_admin = session.get('is_admin', False)
-    
-    if not is_admin:
-        posts = [post for post in posts if post.user_id == user_id]
-    
-    return jsonify([post.to_dict() for post in posts])
+    return jsonify({
+        'success': True,
+        'posts': [post.to_summary_dict() for post in posts],
+        'next_cursor': next_cursor,
+        'total': total
+    })
 
 @post_bp.route('/posts', methods=['POST'])
 @login_required
@@ -96,14 +149,11 @@ def create_post():
     is_admin = session.get('is_admin', False)
     
     if not is_admin:
-        from src.routes.auth_routes import load_users
-        users = load_users()
-        user = next((u for u in users if u.id == user_id), None)
+        user = get_user(user_id)
         
         if user and user.post_limit is not None:
             # Contar publicações do usuário
-            posts = load_posts()
-            user_posts_count = sum(1 for post in posts if post.user_id == user_id)
+            user_posts_count = posts_repo.count_by('user_id', user_id)
             
             if user_posts_count >= user.post_limit:
                 flash('Você atingiu o limite de publicações permitido.', 'danger')
@@ -112,7 +162,7 @@ def create_post():
     data = request.form.to_dict()
     
     # Processar grupos como lista
-    groups = [group.strip() for group in data.get('groups', '').split(',') if group.strip()]
+    groups = parse_groups(data.get('groups', ''))
     
     # Verificar se há auto_delete
     auto_delete = 'auto_delete' in request.form
@@ -145,9 +195,8 @@ def create_post():
         auto_delete=auto_delete
     )
     
-    posts = load_posts()
-    posts.append(post)
-    save_posts(posts)
+    posts_repo.upsert(post)
+    notify_scheduler(post.bot_id)
     
     flash('Publicação criada com sucesso!', 'success')
     return redirect(url_for('posts.index'))
@@ -155,8 +204,7 @@ def create_post():
 @post_bp.route('/posts/<post_id>', methods=['GET'])
 @login_required
 def get_post(post_id):
-    posts = load_posts()
-    post = next((p for p in posts if p.id == post_id), None)
+    post = posts_repo.get(post_id)
     
     if not post:
         flash('Publicação não encontrada.', 'danger')
@@ -171,14 +219,58 @@ def get_post(post_id):
         return redirect(url_for('posts.index'))
     
     if post:
-        return jsonify(post.to_dict())
+        response = jsonify(post.to_dict())
+        response.set_etag(str(post.rev))
+        return response
     return jsonify({"error": "Post não encontrado"}), 404
 
+@post_bp.route('/posts/<post_id>/send-status', methods=['GET'])
+@login_required
+def get_post_send_status(post_id):
+    """Retorna o último resultado de envio de cada grupo da publicação"""
+    post = posts_repo.get(post_id)
+    
+    if not post:
+        return jsonify({'success': False, 'message': 'Publicação não encontrada'}), 404
+    
+    # Verificar permissão (apenas admin ou dono da publicação)
+    if not session.get('is_admin', False) and post.user_id != session.get('user_id'):
+        return jsonify({'success': False, 'message': 'Permissão negada'}), 403
+    
+    return jsonify({'success': True, 'send_status': post.send_status, 'summary': post.status_summary()})
+
+@post_bp.route('/posts/<post_id>/history', methods=['GET'])
+@login_required
+def get_post_history(post_id):
+    """Retorna o histórico de entregas da publicação (mais recentes primeiro)"""
+    post = posts_repo.get(post_id)
+
+    if not post:
+        return jsonify({'success': False, 'message': 'Publicação não encontrada'}), 404
+
+    # Verificar permissão (apenas admin ou dono da publicação)
+    if not session.get('is_admin', False) and post.user_id != session.get('user_id'):
+        return jsonify({'success': False, 'message': 'Permissão negada'}), 403
+
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        since = float(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos'}), 400
+
+    history = delivery_log.history(
+        post_id=post_id,
+        chat_id=request.args.get('chat_id') or None,
+        status=request.args.get('status') or None,
+        since=since,
+        limit=limit
+    )
+    return jsonify({'success': True, 'history': history})
+
 @post_bp.route('/posts/<post_id>', methods=['POST'])
 @login_required
 def update_post(post_id):
-    posts = load_posts()
-    post = next((p for p in posts if p.id == post_id), None)
+    post = posts_repo.get(post_id)
     
     if not post:
         flash('Publicação não encontrada.', 'danger')
@@ -194,55 +286,67 @@ def update_post(post_id):
     
     data = request.form.to_dict()
     
-    for i, p in enumerate(posts):
-        if p.id == post_id:
-            # Processar grupos como lista
-            groups = [group.strip() for group in data.get('groups', '').split(',') if group.strip()]
-            
-            # Verificar se há auto_delete
-            auto_delete = 'auto_delete' in request.form
-            
-            # Processar upload de arquivo se houver
-            file = request.files.get('media_file')
-            media_type = data.get('media_type')
-            media_url = data.get('media_url')
-            
-            if file and file.filename:
-                upload_result = save_uploaded_file(file)
-                if upload_result['success']:
-                    # Se havia um arquivo anterior, excluí-lo
-                    if p.media_url and os.path.exists(os.path.join(os.path.dirname(os.path.dirname(__file__)), p.media_url)):
-                        delete_file(p.media_url)
-                    
-                    media_url = upload_result['file_path']
-                    media_type = upload_result['file_type']
-                else:
-                    flash(f"Erro ao fazer upload do arquivo: {upload_result.get('error')}", 'danger')
-                    return redirect(url_for('posts.index'))
-            
-            posts[i].bot_id = data.get('bot_id')
-            posts[i].media_type = media_type
-            posts[i].media_url = media_url
-            posts[i].caption = data.get('caption')
-            posts[i].button_text = data.get('button_text')
-            posts[i].button_url = data.get('button_url')
-            posts[i].interval_seconds = int(data.get('interval_seconds', 0))
-            posts[i].groups = groups
-            posts[i].updated_at = datetime.now()
-            posts[i].auto_delete = auto_delete
-            
-            save_posts(posts)
-            flash('Publicação atualizada com sucesso!', 'success')
+    # Recusar antes de mexer em arquivos se o formulário já está desatualizado
+    expected_rev = expected_revision(data)
+    if expected_rev is not None and expected_rev != post.rev:
+        flash('A publicação foi alterada por outra pessoa enquanto você editava. Revise e tente novamente.', 'warning')
+        return redirect(url_for('posts.index'))
+    
+    # Processar grupos como lista
+    groups = parse_groups(data.get('groups', ''))
+    
+    # Verificar se há auto_delete
+    auto_delete = 'auto_delete' in request.form
+    
+    # Processar upload de arquivo se houver
+    file = request.files.get('media_file')
+    media_type = data.get('media_type')
+    media_url = data.get('media_url')
+    
+    if file and file.filename:
+        upload_result = save_uploaded_file(file)
+        if upload_result['success']:
+            media_url = upload_result['file_path']
+            media_type = upload_result['file_type']
+        else:
+            flash(f"Erro ao fazer upload do arquivo: {upload_result.get('error')}", 'danger')
             return redirect(url_for('posts.index'))
     
-    flash('Erro ao atualizar publicação.', 'danger')
+    # Gravar apenas os campos do formulário, recusando se a publicação mudou
+    # desde que o formulário foi aberto (campo `rev` ou cabeçalho If-Match)
+    try:
+        updated = posts_repo.patch(post_id, {
+            'bot_id': data.get('bot_id'),
+            'media_type': media_type,
+            'media_url': media_url,
+            'caption': data.get('caption'),
+            'button_text': data.get('button_text'),
+            'button_url': data.get('button_url'),
+            'interval_seconds': int(data.get('interval_seconds', 0)),
+            'groups': groups,
+            'updated_at': datetime.now(),
+            'auto_delete': auto_delete
+        }, expected_rev=expected_rev)
+    except ConflictError:
+        flash('A publicação foi alterada por outra pessoa enquanto você editava. Revise e tente novamente.', 'warning')
+        return redirect(url_for('posts.index'))
+    
+    if not updated:
+        flash('Erro ao atualizar publicação.', 'danger')
+        return redirect(url_for('posts.index'))
+    
+    # A mídia foi substituída: liberar a anterior se nenhuma outra publicação a usa
+    if post.media_url != updated.media_url:
+        release_media(post.media_url)
+    
+    notify_scheduler(post.bot_id, updated.bot_id)
+    flash('Publicação atualizada com sucesso!', 'success')
     return redirect(url_for('posts.index'))
 
 @post_bp.route('/posts/<post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
-    posts = load_posts()
-    post = next((p for p in posts if p.id == post_id), None)
+    post = posts_repo.get(post_id)
     
     if not post:
         flash('Publicação não encontrada.', 'danger')
@@ -256,22 +360,201 @@ def delete_post(post_id):
         flash('Você não tem permissão para excluir esta publicação.', 'danger')
         return redirect(url_for('posts.index'))
     
-    # Excluir arquivo de mídia se for local
-    if post.media_url and not post.media_url.startswith(('http://', 'https://')):
-        delete_file(post.media_url)
+    posts_repo.delete(post_id)
     
-    posts = [p for p in posts if p.id != post_id]
-    save_posts(posts)
+    # Excluir o arquivo de mídia se nenhuma outra publicação o usa
+    release_media(post.media_url)
+    notify_scheduler(post.bot_id)
     
     flash('Publicação excluída com sucesso!', 'success')
     return redirect(url_for('posts.index'))
 
+# Número máximo de operações em uma requisição de lote
+BULK_MAX_OPERATIONS = 1000
+
+# Campos aceitos em `changes` nas alterações em lote: {campo: conversão}
+BULK_PATCH_FIELDS = {
+    'bot_id': str,
+    'media_type': str,
+    'media_url': str,
+    'caption': str,
+    'button_text': str,
+    'button_url': str,
+    'interval_seconds': int,
+    'groups': lambda value: parse_groups(value) if isinstance(value, str) else [str(group) for group in value],
+    'auto_delete': bool,
+    'active': bool,
+}
+
+# Campos alternados pela operação `toggle`
+BULK_TOGGLE_FIELDS = ('active', 'auto_delete')
+
+def check_bot(bot_id):
+    """Lança ValueError se `bot_id` não for de um bot existente"""
+    if not bot_id or get_storage().bots.get(bot_id) is None:
+        raise ValueError("'bot_id' deve ser um bot existente")
+    return bot_id
+
+def bulk_fields(raw):
+    """Valida e converte os campos de uma alteração em lote; lança ValueError se forem inválidos"""
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError("'changes' deve ser um objeto com os campos a alterar")
+    unknown = set(raw) - set(BULK_PATCH_FIELDS)
+    if unknown:
+        raise ValueError(f"Campos não permitidos: {', '.join(sorted(unknown))}")
+    try:
+        fields = {field: BULK_PATCH_FIELDS[field](value) if value is not None else None
+                  for field, value in raw.items()}
+    except (TypeError, ValueError):
+        raise ValueError("Valores inválidos em 'changes'")
+    if 'bot_id' in fields:
+        check_bot(fields['bot_id'])
+    return fields
+
+def bulk_targets(operation, visible):
+    """IDs das publicações alvo de uma operação (`id`, `ids` ou, em reassign, `from_bot_id`)"""
+    if operation.get('from_bot_id'):
+        return [post.id for post in posts_repo.find_by('bot_id', operation['from_bot_id']) if visible(post)]
+    ids = operation.get('ids')
+    if ids is None and operation.get('id'):
+        ids = [operation['id']]
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("Informe 'id' ou 'ids'")
+    return [str(post_id) for post_id in ids]
+
+@post_bp.route('/posts/bulk', methods=['POST'])
+@login_required
+def bulk_posts():
+    """Aplica várias operações sobre publicações com uma única gravação.
+    
+    Corpo JSON: {"operations": [...]}, cada operação com `op` e:
+    - create: `post`, com os campos da publicação
+    - patch: `id` ou `ids`, `changes` (BULK_PATCH_FIELDS) e opcionalmente `rev`
+    - delete: `id` ou `ids`
+    - toggle: `id` ou `ids` e `field` (active ou auto_delete)
+    - reassign: `id`, `ids` ou `from_bot_id` (todas as publicações do bot) e `bot_id`
+    
+    Uma requisição malformada é recusada inteira (400). Publicações
+    inexistentes, sem permissão ou alteradas desde `rev` falham
+    individualmente; `results` traz um resultado por publicação, na ordem
+    das operações. O agendador é avisado uma única vez.
+    """
+    user_id = session.get('user_id')
+    is_admin = session.get('is_admin', False)
+    visible = lambda post: is_admin or post.user_id == user_id
+    
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': "Informe a lista 'operations'"}), 400
+    
+    # Vagas restantes no limite de publicações do usuário
+    remaining = None
+    if not is_admin:
+        user = get_user(user_id)
+        if user and user.post_limit is not None:
+            remaining = max(0, user.post_limit - posts_repo.count_by('user_id', user_id))
+    
+    now = datetime.now()
+    results = []  # um resultado por publicação, na ordem das operações
+    batch = []  # operações do repositório
+    slots = []  # posição em `results` de cada operação do lote
+    previous = {}  # {post_id: publicação antes do lote}
+    
+    def fail(post_id, error):
+        results.append({'id': post_id, 'success': False, 'error': error})
+    
+    try:
+        for operation in operations:
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op == 'create':
+                fields = operation.get('post')
+                if not isinstance(fields, dict):
+                    raise ValueError("'post' deve ser um objeto")
+                fields = bulk_fields({key: value for key, value in fields.items() if key != 'id'})
+                check_bot(fields.get('bot_id'))
+                if remaining is not None:
+                    if remaining == 0:
+                        fail(None, 'limit_reached')
+                        continue
+                    remaining -= 1
+                post = Post(id=str(uuid.uuid4()), user_id=user_id, **fields)
+                slots.append(len(results))
+                results.append(None)
+                batch.append(('upsert', post))
+                continue
+            
+            if op == 'patch':
+                changes = dict(bulk_fields(operation.get('changes')), updated_at=now)
+            elif op == 'toggle':
+                field = operation.get('field')
+                if field not in BULK_TOGGLE_FIELDS:
+                    raise ValueError(f"'field' deve ser um de: {', '.join(BULK_TOGGLE_FIELDS)}")
+                changes = lambda current, field=field: {field: not getattr(current, field), 'updated_at': now}
+            elif op == 'reassign':
+                changes = {'bot_id': check_bot(operation.get('bot_id')), 'updated_at': now}
+            elif op != 'delete':
+                raise ValueError(f"Operação desconhecida: {op}")
+            
+            rev = operation.get('rev')
+            for post_id in bulk_targets(operation, visible):
+                post = posts_repo.get(post_id)
+                if post is None:
+                    fail(post_id, 'not_found')
+                    continue
+                if not visible(post):
+                    fail(post_id, 'forbidden')
+                    continue
+                previous.setdefault(post_id, post)
+                slots.append(len(results))
+                results.append(None)
+                if op == 'delete':
+                    batch.append(('delete', post_id))
+                else:
+                    batch.append(('patch', post_id, changes, int(rev) if rev is not None else None))
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    outcomes = posts_repo.apply_batch(batch) if batch else []
+    if outcomes is None:
+        return jsonify({'success': False, 'message': 'Erro ao salvar as publicações'}), 500
+    
+    affected_bots = set()
+    for slot, operation, outcome in zip(slots, batch, outcomes):
+        post_id = operation[1].id if operation[0] == 'upsert' else operation[1]
+        if isinstance(outcome, ConflictError):
+            results[slot] = {'id': post_id, 'success': False, 'error': 'conflict', 'rev': outcome.current_rev}
+            continue
+        if outcome is None:
+            results[slot] = {'id': post_id, 'success': False, 'error': 'not_found'}
+            continue
+        
+        before = previous.get(post_id)
+        if before is not None:
+            affected_bots.add(before.bot_id)
+        if operation[0] == 'delete':
+            results[slot] = {'id': post_id, 'success': True, 'deleted': True}
+        else:
+            affected_bots.add(outcome.bot_id)
+            results[slot] = {'id': post_id, 'success': True, 'rev': outcome.rev}
+        
+        # A mídia foi substituída ou deixou de ser usada
+        old_media = before.media_url if before is not None else None
+        if old_media and (operation[0] == 'delete' or outcome.media_url != old_media):
+            release_media(old_media)
+    
+    notify_scheduler(*affected_bots)
+    
+    return jsonify({
+        'success': all(result['success'] for result in results),
+        'results': results
+    })
+
 @post_bp.route('/posts/<post_id>/toggle-auto-delete', methods=['POST'])
 @login_required
 def toggle_auto_delete(post_id):
     """Ativa/desativa a deleção automática para uma publicação"""
-    posts = load_posts()
-    post = next((p for p in posts if p.id == post_id), None)
+    post = posts_repo.get(post_id)
     
     if not post:
         return jsonify({'success': False, 'message': 'Publicação não encontrada'})
@@ -283,14 +566,12 @@ def toggle_auto_delete(post_id):
     if not is_admin and post.user_id != user_id:
         return jsonify({'success': False, 'message': 'Permissão negada'})
     
-    # Alternar o estado de auto_delete
-    for i, p in enumerate(posts):
-        if p.id == post_id:
-            posts[i].auto_delete = not posts[i].auto_delete
-            auto_delete = posts[i].auto_delete
-            break
-    
-    save_posts(posts)
+    # Alternar sobre o valor atual do registro, sob o lock do repositório
+    updated = posts_repo.patch(post_id, lambda current: {'auto_delete': not current.auto_delete})
+    if not updated:
+        return jsonify({'success': False, 'message': 'Erro ao atualizar publicação'})
+    auto_delete = updated.auto_delete
+    notify_scheduler(updated.bot_id)
     
     return jsonify({
         'success': True, 
@@ -301,9 +582,37 @@ def toggle_auto_delete(post_id):
 @post_bp.route('/media')
 @login_required
 def media_library():
-    """Exibe a biblioteca de mídia"""
-    media_list = get_media_list()
-    return render_template('media_library.html', media_list=media_list)
+    """Exibe uma página da biblioteca de mídia; ver `query_media`"""
+    media_list, next_cursor, total_media = query_media(request.args)
+    references = {media.id: media_references(media.path) for media in media_list}
+    filters = {key: request.args.get(key, '') for key in ('type', 'used', 'q', 'sort', 'limit')}
+    next_page_url = None
+    if next_cursor:
+        next_page_url = url_for('posts.media_library', cursor=next_cursor, **{key: value for key, value in filters.items() if value})
+    
+    return render_template('media_library.html', media_list=media_list,
+                          references=references,
+                          next_page_url=next_page_url,
+                          total_media=total_media,
+                          filters=filters)
+
+@post_bp.route('/media/thumbs/<filename>')
+@login_required
+def media_thumbnail(filename):
+    """Miniatura de uma mídia da biblioteca; ver `find_thumbnail`"""
+    media = media_index().get(filename)
+    if media is None:
+        return jsonify({'success': False, 'message': 'Arquivo não encontrado'}), 404
+    
+    path = find_thumbnail(media.id, media.type)
+    if path is not None:
+        response = send_file(path, mimetype='image/jpeg', max_age=MEDIA_THUMBNAIL_MAX_AGE)
+        # A biblioteca exige login: apenas o cache do navegador
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
+    # Vídeo sem capa (ainda na fila ou sem ffmpeg): a página mostra o ícone
+    return jsonify({'success': False, 'message': 'Miniatura indisponível'}), 404
 
 @post_bp.route('/media/upload', methods=['POST'])
 @login_required
@@ -319,7 +628,7 @@ def upload_media():
         flash('Nenhum arquivo selecionado.', 'danger')
         return redirect(url_for('posts.media_library'))
     
-    upload_result = save_uploaded_file(file)
+    upload_result = save_uploaded_file(file, library=True)
     
     if upload_result['success']:
         flash('Arquivo enviado com sucesso!', 'success')
@@ -339,8 +648,7 @@ def delete_media():
         return redirect(url_for('posts.media_library'))
     
     # Verificar se o arquivo está sendo usado em alguma publicação
-    posts = load_posts()
-    is_used = any(post.media_url == file_path for post in posts)
+    is_used = media_references(file_path) > 0
     
     if is_used:
         flash('Este arquivo está sendo usado em uma ou mais publicações e não pode ser excluído.', 'danger')
@@ -354,43 +662,166 @@ def delete_media():
     
     return redirect(url_for('posts.media_library'))
 
+@post_bp.errorhandler(UploadError)
+def upload_error(error):
+    """Falha no upload em partes"""
+    return jsonify({'success': False, 'message': str(error)}), error.status
+
+def owned_upload(upload_id):
+    """Estado do upload em partes, se pertencer ao usuário logado (ou ele for admin)"""
+    state = chunked_upload.get_upload(upload_id)
+    chunked_upload.check_owner(state, session.get('user_id'), session.get('is_admin', False))
+    return state
+
+@post_bp.route('/media/uploads', methods=['POST'])
+@login_required
+def create_chunked_upload():
+    """Inicia um upload em partes; o cliente então envia as partes com PUT, em qualquer ordem"""
+    data = request.get_json(silent=True) or {}
+    state = chunked_upload.create_upload(
+        data.get('filename'), data.get('size'), session.get('user_id'), data.get('sha256')
+    )
+    return jsonify({'success': True, **chunked_upload.describe(state)}), 201
+
+@post_bp.route('/media/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_chunked_upload(upload_id):
+    """Partes já recebidas, para retomar um upload interrompido"""
+    return jsonify({'success': True, **chunked_upload.describe(owned_upload(upload_id))})
+
+@post_bp.route('/media/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def put_upload_chunk(upload_id):
+    """Grava uma parte (corpo cru da requisição) a partir de `?offset=`"""
+    owned_upload(upload_id)
+    state = chunked_upload.write_chunk(
+        upload_id,
+        request.args.get('offset', type=int),
+        request.stream,
+        request.content_length,
+        request.headers.get('X-Chunk-SHA256')
+    )
+    return jsonify({'success': True, **chunked_upload.describe(state)})
+
+@post_bp.route('/media/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_chunked_upload(upload_id):
+    """Conclui o upload e adiciona o arquivo à biblioteca de mídia"""
+    owned_upload(upload_id)
+    return jsonify(chunked_upload.finalize_upload(upload_id))
+
+@post_bp.route('/media/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_chunked_upload(upload_id):
+    """Descarta um upload em andamento"""
+    owned_upload(upload_id)
+    chunked_upload.abort_upload(upload_id)
+    return jsonify({'success': True})
+
+@post_bp.route('/posts/events', methods=['GET'])
+@login_required
+def post_events():
+    """Stream (Server-Sent Events) dos eventos de entrega das publicações.
+    
+    Eventos: `send_started`, `delivery` (resultado por grupo: success,
+    retrying ou failed) e `deleted`. Um cliente que reconecta com
+    Last-Event-ID recebe os eventos perdidos; se eles não estiverem mais no
+    buffer, recebe `reset` e deve recarregar o estado pelos endpoints de status.
+    """
+    user_id = session.get('user_id')
+    is_admin = session.get('is_admin', False)
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id')) or None
+    
+    subscription = bot_service.subscribe_events(last_event_id)
+    
+    def stream():
+        try:
+            yield f"retry: {EVENT_STREAM_RETRY_MS}\n\n"
+            while True:
+                event = subscription.get(timeout=EVENT_STREAM_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.type == RESET_EVENT:
+                    # O assinante foi desligado; o navegador reconecta a partir deste ID
+                    yield format_sse(event)
+                    return
+                if is_admin or event.data.get('user_id') == user_id:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @post_bp.route('/posts/status', methods=['GET'])
 @login_required
 def get_posts_status():
-    """Retorna o status atual de todas as publicações"""
-    from src.main import bot_service
-    
-    posts = load_posts()
-    bots = load_bots()
+    """Retorna o status atual das publicações.
     
+    Responde 304 se nada mudou desde a versão enviada em If-None-Match.
+    Com `?since=<version>`, `posts` traz apenas as publicações alteradas desde
+    essa versão e `removed` as que deixaram de existir.
+    """
     # Filtrar posts pelo usuário atual, exceto para admin
     user_id = session.get('user_id')
     is_admin = session.get('is_admin', False)
+    since = request.args.get('since')
+    version = bot_service.refresh_changes()
+    
+    def build_payload():
+        service_status = bot_service.status(since)
+        removed = []
+        if not service_status['delta']:
+            posts = load_posts() if is_admin else posts_repo.find_by('user_id', user_id)
+        else:
+            posts = []
+            for post_id in service_status['changed_posts']:
+                post = posts_repo.get(post_id)
+                if post is None:
+                    removed.append(post_id)
+                elif is_admin or post.user_id == user_id:
+                    posts.append(post)
+        
+        # Obter status de cada publicação
+        posts_status = []
+        for post in posts:
+            posts_status.append({
+                'id': post.id,
+                'bot_id': post.bot_id,
+                'bot_name': get_bot_name(post.bot_id) or 'Bot desconhecido',
+                'active': getattr(post, 'active', True),
+                'auto_delete': getattr(post, 'auto_delete', False),
+                'last_sent': service_status['last_sent'].get(post.id, 'Nunca'),
+                'send_status': post.send_status
+            })
+        
+        return {
+            'success': True,
+            'version': version,
+            'delta': service_status['delta'],
+            'posts': posts_status,
+            'removed': removed,
+            'bot_service_status': service_status
+        }
+    
+    return conditional_json(f"{version}-{user_id}", build_payload)
+
+@post_bp.route('/posts/<post_id>/send-now', methods=['POST'])
+@login_required
+def send_post_now(post_id):
+    """Antecipa para agora o próximo envio da publicação"""
+    post = posts_repo.get(post_id)
     
-    if not is_admin:
-        posts = [post for post in posts if post.user_id == user_id]
-    
-    # Mapear IDs de bots para nomes
-    bot_names = {bot.id: bot.name for bot in bots}
+    if not post:
+        return jsonify({'success': False, 'message': 'Publicação não encontrada'}), 404
     
-    # Obter status de cada publicação
-    posts_status = []
-    for post in posts:
-        last_sent = bot_service.last_sent.get(post.id)
-        last_sent_str = datetime.fromtimestamp(last_sent).strftime('%Y-%m-%d %H:%M:%S') if last_sent else 'Nunca'
-        
-        posts_status.append({
-            'id': post.id,
-            'bot_id': post.bot_id,
-            'bot_name': bot_names.get(post.bot_id, 'Bot desconhecido'),
-            'active': getattr(post, 'active', True),
-            'auto_delete': getattr(post, 'auto_delete', False),
-            'last_sent': last_sent_str,
-            'send_status': post.send_status
-        })
+    # Verificar permissão (apenas admin ou dono da publicação)
+    if not session.get('is_admin', False) and post.user_id != session.get('user_id'):
+        return jsonify({'success': False, 'message': 'Permissão negada'}), 403
     
-    return jsonify({
-        'success': True,
-        'posts': posts_status,
-        'bot_service_status': bot_service.status()
-    })
+    if not bot_service.send_now(post_id):
+        return jsonify({'success': False, 'message': 'A publicação está inativa ou o bot dela não está em execução'}), 409
+    return jsonify({'success': True, 'message': 'Envio solicitado'})
@@ -0,0 +1,49 @@
+import os
+import threading
+from src.storage.errors import ConflictError
+
+# Diretório de dados padrão do projeto
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# Backend de armazenamento: 'json' (padrão) ou 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+
+# Nome do arquivo do banco dentro do diretório de dados (backend sqlite)
+SQLITE_FILENAME = os.environ.get('SQLITE_FILENAME', 'app.db')
+
+_storages = {}  # {(backend, data_dir): instância}
+_storages_lock = threading.Lock()
+
+
+def get_storage(data_dir=None, backend=None):
+    """Retorna o armazenamento do diretório de dados.
+
+    Expõe os repositórios `posts`, `bots` e `users`, o índice da biblioteca
+    de mídia `media` e o log de entregas `deliveries`.
+
+    Há uma única instância por backend e diretório dentro do processo, de
+    modo que rotas e serviço do bot compartilham os mesmos repositórios.
+    """
+    data_dir = os.path.abspath(data_dir or DEFAULT_DATA_DIR)
+    backend = (backend or STORAGE_BACKEND).lower()
+    key = (backend, data_dir)
+
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is not None:
+            return storage
+
+        if backend == 'json':
+            from src.storage.json_backend import JsonStorage
+            storage = JsonStorage(data_dir)
+        elif backend == 'sqlite':
+            from src.storage.sqlite_backend import SqliteStorage
+            from src.storage.migrate import migrate_json_to_sqlite
+            storage = SqliteStorage(os.path.join(data_dir, SQLITE_FILENAME))
+            # Na primeira abertura, importar os dados dos arquivos JSON existentes
+            migrate_json_to_sqlite(data_dir, storage)
+        else:
+            raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+
+        _storages[key] = storage
+        return storage
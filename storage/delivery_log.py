@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rotação do arquivo de entregas: tamanho máximo de cada arquivo e quantos antigos manter
+DELIVERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+DELIVERY_LOG_BACKUP_COUNT = 5
+
+# Quantidade padrão de registros retornados pelas consultas de histórico
+DEFAULT_HISTORY_LIMIT = 100
+
+
+def make_entry(post_id, bot_id, chat_id, status, **fields):
+    """Monta um registro de entrega; campos extras com valor None são omitidos"""
+    entry = {
+        'ts': time.time(),
+        'post_id': post_id,
+        'bot_id': bot_id,
+        'chat_id': str(chat_id),
+        'status': status,
+    }
+    entry.update((key, value) for key, value in fields.items() if value is not None)
+    return entry
+
+
+def matches(entry, post_id=None, bot_id=None, chat_id=None, status=None, since=None):
+    """Indica se o registro atende aos filtros informados (None ignora o filtro)"""
+    return ((post_id is None or entry.get('post_id') == post_id) and
+            (bot_id is None or entry.get('bot_id') == bot_id) and
+            (chat_id is None or entry.get('chat_id') == str(chat_id)) and
+            (status is None or entry.get('status') == status) and
+            (since is None or entry.get('ts', 0) >= since))
+
+
+class JsonlDeliveryLog:
+    """Log de entregas somente de inclusão em arquivos JSONL com rotação.
+
+    Cada linha é um registro de envio, tentativa, falha ou deleção de uma
+    publicação em um grupo. Quando o arquivo passa de `max_bytes`, ele é
+    renomeado para `<arquivo>.1` (e os antigos para .2, .3, ...), mantendo
+    no máximo `backup_count` arquivos antigos.
+    """
+
+    def __init__(self, path, max_bytes=DELIVERY_LOG_MAX_BYTES, backup_count=DELIVERY_LOG_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock = threading.Lock()
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def append(self, post_id, bot_id, chat_id, status, **fields):
+        """Acrescenta um registro de entrega ao log"""
+        entry = make_entry(post_id, bot_id, chat_id, status, **fields)
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except OSError as e:
+                logger.error(f"Erro ao registrar entrega no log: {e}")
+        return entry
+
+    def _files_newest_first(self):
+        paths = [self.path] + [f"{self.path}.{index}" for index in range(1, self.backup_count + 1)]
+        return [path for path in paths if os.path.exists(path)]
+
+    def _entries_newest_first(self):
+        for path in self._files_newest_first():
+            try:
+                with open(path, 'r') as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in reversed(lines):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Linha incompleta (ex.: queda no meio da escrita)
+                    continue
+
+    def history(self, post_id=None, bot_id=None, chat_id=None, status=None, since=None,
+                limit=DEFAULT_HISTORY_LIMIT):
+        """Retorna os registros mais recentes que atendem aos filtros, do mais novo ao mais antigo"""
+        results = []
+        for entry in self._entries_newest_first():
+            if since is not None and entry.get('ts', 0) < since:
+                break
+            if matches(entry, post_id, bot_id, chat_id, status):
+                results.append(entry)
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def last(self, post_id, chat_id):
+        """Retorna o registro mais recente de uma publicação em um grupo ou None"""
+        entries = self.history(post_id=post_id, chat_id=chat_id, limit=1)
+        return entries[0] if entries else None
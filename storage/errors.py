@@ -0,0 +1,8 @@
+class ConflictError(Exception):
+    """O registro foi alterado por outra escrita desde a versão lida pelo chamador"""
+
+    def __init__(self, item_id, expected_rev, current_rev):
+        super().__init__(f"Registro {item_id} alterado: revisão esperada {expected_rev}, atual {current_rev}")
+        self.item_id = item_id
+        self.expected_rev = expected_rev
+        self.current_rev = current_rev
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+
+
+def atomic_write_json(path, data, indent=None):
+    """Grava JSON de forma atômica: arquivo temporário, fsync e rename.
+
+    Uma queda no meio da escrita deixa o arquivo anterior intacto em vez de
+    um arquivo truncado. Sem `indent`, usa a forma compacta.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    separators = None if indent else (',', ':')
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            # Serializar de uma vez é bem mais rápido que json.dump em pequenos pedaços
+            f.write(json.dumps(data, indent=indent, separators=separators))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persistir também a entrada do diretório (o rename)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,464 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from src.models.bot import Bot
+from src.models.fields import bumps_revision
+from src.models.media import MediaFile
+from src.models.post import Post
+from src.models.user import User
+from src.storage.delivery_log import JsonlDeliveryLog
+from src.storage.errors import ConflictError
+from src.storage.files import atomic_write_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Janela para agrupar escritas adiadas em uma única gravação (segundos)
+FLUSH_DELAY_SECONDS = 0.5
+
+# Indentação dos arquivos editáveis à mão; posts.json é escrito só pelo sistema
+# e fica compacto, a menos que STORAGE_PRETTY_JSON esteja ativo
+PRETTY_INDENT = 2
+PRETTY_JSON = os.environ.get('STORAGE_PRETTY_JSON', '').lower() in ('1', 'true', 'yes')
+
+
+class JsonRepository:
+    """Repositório de registros guardados como uma lista em um arquivo JSON.
+
+    Os registros ficam em memória, já convertidos em modelos, e o arquivo só
+    é lido de novo quando seu mtime ou tamanho mudam (alteração feita por
+    outro processo ou à mão). `version` é incrementado a cada alteração
+    percebida, e as funções registradas com `subscribe` recebem o ID do
+    registro alterado (ou None quando o arquivo inteiro foi substituído).
+
+    Os campos de `indexed_fields` têm índices em memória ({valor: {id:
+    registro}}), atualizados a cada escrita apenas para o registro alterado;
+    `get`, `find_by` e `count_by` nesses campos não percorrem a lista.
+
+    Os objetos retornados são os mesmos mantidos no cache: quem alterar um
+    registro deve salvá-lo com `upsert` ou, de preferência, `patch`. As
+    escritas guardam uma cópia do registro, de modo que o chamador pode
+    continuar alterando o seu objeto.
+
+    Cada gravação incrementa a revisão (`rev`) do registro, exceto as que
+    alteram apenas campos não versionados (ver `bumps_revision`). `patch` altera
+    apenas os campos informados sobre a versão mais recente do arquivo e,
+    com `expected_rev`, recusa a escrita (ConflictError) se o registro mudou
+    desde que foi lido. As escritas são serializadas entre threads e entre
+    processos por um lock de arquivo (`<arquivo>.lock`).
+
+    Patches adiados (`deferred=True`) atualizam apenas a memória; os campos
+    alterados são gravados juntos em uma única escrita após
+    FLUSH_DELAY_SECONDS. Toda gravação é atômica; `apply_batch` grava várias
+    operações de uma vez.
+    """
+
+    def __init__(self, path, model, label, indexed_fields=(), indent=PRETTY_INDENT):
+        self.path = path
+        self.model = model
+        self.label = label  # nome usado nas mensagens de log
+        self.indexed_fields = tuple(indexed_fields)
+        self.indent = indent  # None grava o arquivo na forma compacta
+        self.lock = threading.RLock()
+        self.lock_path = f"{path}.lock"
+        self._lock_depth = 0  # o flock não é reentrante dentro do processo
+        self.version = 0
+        self.listeners = []  # funções chamadas com o ID de cada registro alterado
+        self._by_id = None  # {id: modelo} na ordem do arquivo; None enquanto não carregado
+        self._indexes = {}  # {campo: {valor: {id: modelo}}}
+        # Valores indexados de cada registro; os objetos do cache podem ser
+        # alterados pelo chamador antes do upsert, então não servem para isso
+        self._index_keys = {}  # {id: (valor, ...)}
+        self._stamp = None  # (mtime_ns, tamanho) do arquivo em cache
+        self._dirty = {}  # {id: {campo: valor}} alterados em memória e ainda não gravados
+        self._flush_timer = None
+
+    @contextmanager
+    def _write_lock(self):
+        """Lock exclusivo para leitura-alteração-gravação, entre threads e processos"""
+        with self.lock:
+            if fcntl is None or self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_file(self):
+        if not os.path.exists(self.path):
+            atomic_write_json(self.path, [])
+            logger.info(f"Arquivo de {self.label} criado: {self.path}")
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _index_add(self, item):
+        values = tuple(getattr(item, field, None) for field in self.indexed_fields)
+        for field, value in zip(self.indexed_fields, values):
+            self._indexes[field].setdefault(value, {})[item.id] = item
+        self._index_keys[item.id] = values
+
+    def _index_remove(self, item_id):
+        values = self._index_keys.pop(item_id, ())
+        for field, value in zip(self.indexed_fields, values):
+            bucket = self._indexes[field].get(value)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._indexes[field][value]
+
+    def _put(self, item):
+        """Insere ou substitui um registro no cache, atualizando os índices"""
+        previous = self._by_id.get(item.id)
+        if previous is not None:
+            self._index_remove(item.id)
+        self._by_id[item.id] = item
+        self._index_add(item)
+        return previous
+
+    def _remove(self, item_id):
+        item = self._by_id.pop(item_id, None)
+        if item is not None:
+            self._index_remove(item_id)
+        return item
+
+    def _set_cache(self, items, stamp):
+        self._by_id = {}
+        self._indexes = {field: {} for field in self.indexed_fields}
+        self._index_keys = {}
+        for item in items:
+            self._put(item)
+        self._stamp = stamp
+
+    def _quarantine_corrupted_file(self):
+        """Preserva um arquivo ilegível com outro nome em vez de sobrescrevê-lo"""
+        backup_path = f"{self.path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        try:
+            os.replace(self.path, backup_path)
+            logger.error(f"Arquivo de {self.label} ilegível preservado em {backup_path}")
+        except OSError as e:
+            logger.error(f"Não foi possível preservar o arquivo de {self.label}: {e}")
+
+    def _load(self):
+        """Retorna o mapa {id: registro} em cache, relendo o arquivo apenas se ele mudou"""
+        with self.lock:
+            stamp = self._file_stamp()
+            if self._by_id is not None and stamp is not None and stamp == self._stamp:
+                return self._by_id
+
+            self._ensure_file()
+            stamp = self._file_stamp()
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                items = [self.model.from_dict(item) for item in data]
+            except Exception as e:
+                logger.error(f"Erro ao carregar {self.label}: {e}")
+                if self._by_id is not None:
+                    # Continuar com a última versão válida; a próxima gravação corrige o arquivo
+                    self._stamp = stamp
+                    return self._by_id
+                self._quarantine_corrupted_file()
+                items, stamp = [], None
+
+            reloaded = self._by_id is not None
+            self._set_cache(items, stamp)
+            # Reaplicar as alterações ainda não gravadas sobre a versão do disco
+            for item_id, fields in list(self._dirty.items()):
+                item = self._by_id.get(item_id)
+                if item is None:
+                    # Excluído por outro processo
+                    del self._dirty[item_id]
+                    continue
+                self._index_remove(item_id)
+                self._apply(item, fields)
+                self._index_add(item)
+            if reloaded:
+                # Alterado fora deste processo: não se sabe quais registros mudaram
+                self._changed(None)
+            return self._by_id
+
+    @staticmethod
+    def _apply(item, fields):
+        for field, value in fields.items():
+            setattr(item, field, copy.deepcopy(value))
+        if bumps_revision(type(item), fields):
+            item.rev = (item.rev or 0) + 1
+
+    def _persist(self):
+        """Grava o conteúdo do cache no arquivo"""
+        try:
+            atomic_write_json(self.path, [item.to_dict() for item in self._by_id.values()], indent=self.indent)
+        except Exception as e:
+            logger.error(f"Erro ao salvar {self.label}: {e}")
+            return False
+        self._dirty.clear()
+        self._stamp = self._file_stamp()
+        return True
+
+    def subscribe(self, listener):
+        """Registra uma função chamada a cada alteração com o ID do registro (None: todos)"""
+        self.listeners.append(listener)
+
+    def _changed(self, item_id):
+        self.version += 1
+        for listener in self.listeners:
+            try:
+                listener(item_id)
+            except Exception as e:
+                logger.error(f"Erro ao notificar alteração em {self.label}: {e}")
+
+    def _schedule_flush(self):
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(FLUSH_DELAY_SECONDS, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Grava imediatamente as alterações adiadas, se houver"""
+        with self._write_lock():
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return True
+            count = len(self._dirty)
+            self._load()
+            if not self._persist():
+                # Tentar novamente mais tarde sem perder as alterações
+                self._schedule_flush()
+                return False
+            logger.debug(f"{count} registros de {self.label} gravados em lote")
+            return True
+
+    def refresh(self):
+        """Relê o arquivo se ele foi alterado por outro processo (custa um stat quando não foi)"""
+        self._load()
+
+    def all(self):
+        """Retorna todos os registros"""
+        with self.lock:
+            return list(self._load().values())
+
+    def save_all(self, items):
+        """Substitui todos os registros salvos pela lista informada"""
+        with self._write_lock():
+            self._load()
+            previous = (self._by_id, self._indexes, self._index_keys, self._stamp)
+            self._set_cache([copy.deepcopy(item) for item in items], self._stamp)
+            if not self._persist():
+                self._by_id, self._indexes, self._index_keys, self._stamp = previous
+                return False
+            self._changed(None)
+            return True
+
+    def get(self, item_id):
+        """Retorna o registro com o ID informado ou None"""
+        with self.lock:
+            return self._load().get(item_id)
+
+    def find_by(self, field, value):
+        """Retorna os registros cujo campo tem o valor informado"""
+        with self.lock:
+            items = self._load()
+            if field == 'id':
+                item = items.get(value)
+                return [item] if item is not None else []
+            if field in self._indexes:
+                return list(self._indexes[field].get(value, {}).values())
+            return [item for item in items.values() if getattr(item, field, None) == value]
+
+    def count_by(self, field, value):
+        """Conta os registros cujo campo tem o valor informado (ex.: referências a uma mídia)"""
+        with self.lock:
+            self._load()
+            if field in self._indexes:
+                return len(self._indexes[field].get(value, ()))
+            return len(self.find_by(field, value))
+
+    def count(self):
+        with self.lock:
+            return len(self._load())
+
+    def upsert(self, item):
+        """Insere o registro ou substitui o registro com o mesmo ID (a última escrita prevalece)"""
+        with self._write_lock():
+            items = self._load()
+            previous = items.get(item.id)
+            item.rev = (previous.rev if previous is not None else item.rev or 0) + 1
+            snapshot = copy.deepcopy(item)
+            self._put(snapshot)
+
+            if self._persist():
+                self._changed(snapshot.id)
+                return True
+
+            # Desfazer a alteração no cache se o arquivo não pôde ser gravado
+            if previous is None:
+                self._remove(snapshot.id)
+            elif previous is item:
+                # O chamador alterou o próprio objeto do cache: reler o arquivo na próxima consulta
+                self._put(previous)
+                self._stamp = None
+            else:
+                self._put(previous)
+            return False
+
+    def patch(self, item_id, changes, expected_rev=None, deferred=False):
+        """Altera apenas os campos informados de um registro e retorna o registro atualizado.
+
+        `changes` é um dict {campo: valor} ou uma função que recebe o registro
+        atual e retorna esse dict (executada sob o lock, para alterações que
+        dependem do valor atual). Retorna None se o registro não existir ou
+        não puder ser gravado e lança ConflictError se `expected_rev` não for
+        a revisão atual.
+        """
+        with self._write_lock():
+            current = self._load().get(item_id)
+            if current is None:
+                return None
+            if expected_rev is not None and current.rev != expected_rev:
+                raise ConflictError(item_id, expected_rev, current.rev)
+
+            fields = changes(current) if callable(changes) else changes
+            updated = copy.deepcopy(current)
+            self._apply(updated, fields)
+            self._put(updated)
+
+            if deferred:
+                self._dirty.setdefault(item_id, {}).update(fields)
+                self._changed(item_id)
+                self._schedule_flush()
+                return updated
+
+            if self._persist():
+                self._changed(item_id)
+                return updated
+            self._put(current)
+            return None
+
+    def delete(self, item_id):
+        """Remove o registro com o ID informado; retorna False se ele não existir"""
+        with self._write_lock():
+            self._load()
+            if item_id not in self._by_id:
+                return False
+            # Guardar a ordem para restaurar o cache se a gravação falhar
+            order = list(self._by_id)
+            removed = self._remove(item_id)
+            dirty = self._dirty.pop(item_id, None)
+            if self._persist():
+                self._changed(item_id)
+                return True
+            self._put(removed)
+            self._by_id = {key: self._by_id[key] for key in order}
+            if dirty is not None:
+                self._dirty[item_id] = dirty
+            return False
+
+    def apply_batch(self, operations):
+        """Aplica várias operações com uma única gravação do arquivo.
+
+        Operações: ('upsert', registro), ('patch', id, changes[, expected_rev])
+        e ('delete', id), com a mesma semântica dos métodos correspondentes.
+        Retorna uma lista com o resultado de cada operação, na ordem: o
+        registro gravado (upsert/patch), True (delete), None se o registro
+        não existir ou o ConflictError de uma revisão divergente; essas
+        falhas não impedem as demais operações. Retorna None, sem aplicar
+        nada, se o arquivo não puder ser gravado.
+        """
+        with self._write_lock():
+            self._load()
+            snapshot = (list(self._by_id.values()), self._stamp, dict(self._dirty))
+            results, changed = [], []
+            try:
+                for operation in operations:
+                    action, target = operation[0], operation[1]
+                    if action == 'upsert':
+                        previous = self._by_id.get(target.id)
+                        target.rev = (previous.rev if previous is not None else target.rev or 0) + 1
+                        result = copy.deepcopy(target)
+                        self._put(result)
+                    elif action == 'patch':
+                        changes = operation[2]
+                        expected_rev = operation[3] if len(operation) > 3 else None
+                        current = self._by_id.get(target)
+                        if current is None:
+                            result = None
+                        elif expected_rev is not None and current.rev != expected_rev:
+                            result = ConflictError(target, expected_rev, current.rev)
+                        else:
+                            result = copy.deepcopy(current)
+                            self._apply(result, changes(current) if callable(changes) else changes)
+                            self._put(result)
+                    elif action == 'delete':
+                        result = True if self._remove(target) is not None else None
+                        self._dirty.pop(target, None)
+                    else:
+                        raise ValueError(f"Operação desconhecida: {action}")
+                    results.append(result)
+                    if result is not None and not isinstance(result, ConflictError):
+                        changed.append(result.id if action != 'delete' else target)
+            except Exception:
+                self._set_cache(*snapshot[:2])
+                self._dirty = snapshot[2]
+                raise
+
+            if not changed:
+                return results
+            if not self._persist():
+                self._set_cache(*snapshot[:2])
+                self._dirty = snapshot[2]
+                return None
+            for item_id in dict.fromkeys(changed):
+                self._changed(item_id)
+            return results
+
+
+class JsonStorage:
+    """Armazenamento em arquivos JSON no diretório de dados (padrão)"""
+
+    backend = 'json'
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.posts = JsonRepository(os.path.join(data_dir, 'posts.json'), Post, 'publicações',
+                                    indexed_fields=('bot_id', 'user_id', 'media_url'),
+                                    indent=PRETTY_INDENT if PRETTY_JSON else None)
+        self.bots = JsonRepository(os.path.join(data_dir, 'bots.json'), Bot, 'bots',
+                                   indexed_fields=('is_active',))
+        self.users = JsonRepository(os.path.join(data_dir, 'users.json'), User, 'usuários',
+                                    indexed_fields=('username',))
+        self.media = JsonRepository(os.path.join(data_dir, 'media.json'), MediaFile, 'mídias',
+                                    indexed_fields=('type',), indent=None)
+        self.deliveries = JsonlDeliveryLog(os.path.join(data_dir, 'deliveries.jsonl'))
+        atexit.register(self.flush)
+
+    def flush(self):
+        """Grava as alterações adiadas de todos os repositórios"""
+        for repo in (self.posts, self.bots, self.users, self.media):
+            repo.flush()
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import os
+from datetime import datetime
+from src.storage.json_backend import JsonStorage
+from src.storage.sqlite_backend import SqliteStorage
+
+logger = logging.getLogger(__name__)
+
+# Marcador gravado no banco após a importação dos arquivos JSON
+MIGRATION_KEY = 'json_migrated_at'
+
+
+def migrate_json_to_sqlite(data_dir, sqlite_storage, force=False):
+    """Importa posts.json, bots.json e users.json para o banco SQLite.
+
+    A importação acontece uma única vez por banco; use `force` para repeti-la
+    (os registros do banco são substituídos pelos dos arquivos).
+    Retorna a quantidade de registros importados por tabela, ou None se a
+    migração já tinha sido feita.
+    """
+    if sqlite_storage.get_meta(MIGRATION_KEY) and not force:
+        return None
+
+    counts = {}
+    json_storage = JsonStorage(data_dir)
+    for name in ('posts', 'bots', 'users'):
+        source = getattr(json_storage, name)
+        if not os.path.exists(source.path):
+            counts[name] = 0
+            continue
+        items = source.all()
+        getattr(sqlite_storage, name).save_all(items)
+        counts[name] = len(items)
+
+    sqlite_storage.set_meta(MIGRATION_KEY, datetime.now().isoformat())
+    logger.info(f"Dados JSON importados para {sqlite_storage.db_path}: {counts}")
+    return counts
+
+
+if __name__ == '__main__':
+    from src.storage import DEFAULT_DATA_DIR, SQLITE_FILENAME
+
+    parser = argparse.ArgumentParser(description="Importa os arquivos JSON de dados para o banco SQLite")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--db', default=None, help="caminho do banco (padrão: <data-dir>/" + SQLITE_FILENAME + ")")
+    parser.add_argument('--force', action='store_true', help="importar novamente mesmo se já migrado")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_path = args.db or os.path.join(args.data_dir, SQLITE_FILENAME)
+    result = migrate_json_to_sqlite(args.data_dir, SqliteStorage(db_path), force=args.force)
+    print("Migração já realizada anteriormente (use --force para repetir)" if result is None
+          else f"Registros importados: {result}")
@@ -0,0 +1,370 @@
+import json
+import logging
+import os
+import sqlite3
+import copy
+import threading
+from src.models.bot import Bot
+from src.models.fields import bumps_revision
+from src.models.media import MediaFile
+from src.models.post import Post
+from src.models.user import User
+from src.storage.delivery_log import DEFAULT_HISTORY_LIMIT, make_entry
+from src.storage.errors import ConflictError
+
+logger = logging.getLogger(__name__)
+
+# Quantas linhas do diário de alterações manter (consultado por `refresh`)
+CHANGE_LOG_KEEP = 10000
+
+# Tabelas: (nome, modelo, colunas indexadas extraídas do registro)
+TABLES = (
+    ('posts', Post, ('bot_id', 'user_id', 'media_url')),
+    ('bots', Bot, ('is_active',)),
+    ('users', User, ('username',)),
+    ('media', MediaFile, ('type',)),
+)
+
+
+class SqliteRepository:
+    """Repositório de registros em uma tabela SQLite.
+
+    Cada linha guarda o registro completo como JSON na coluna `data`, mais
+    colunas indexadas para as consultas frequentes. A ordem de inserção é
+    preservada pelo rowid.
+
+    Toda escrita registra o ID alterado na tabela `changes`, na mesma
+    transação; `refresh` lê as entradas novas (deste e de outros processos)
+    e repassa cada ID às funções registradas com `subscribe`.
+    """
+
+    def __init__(self, storage, table, model, indexed_fields):
+        self.storage = storage
+        self.table = table
+        self.model = model
+        self.indexed_fields = indexed_fields
+        self.version = 0  # incrementado a cada alteração percebida
+        self.listeners = []  # funções chamadas com o ID de cada registro alterado
+        self.refresh_lock = threading.Lock()
+        self.last_change_seq = storage.last_change_seq()
+        columns = ('id',) + indexed_fields + ('data',)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+        self.upsert_sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}"
+        )
+
+    def _row(self, item):
+        data = item.to_dict()
+        return (item.id,) + tuple(data.get(field) for field in self.indexed_fields) + (json.dumps(data),)
+
+    def _from_rows(self, rows):
+        return [self.model.from_dict(json.loads(row[0])) for row in rows]
+
+    def all(self):
+        """Carrega todos os registros"""
+        rows = self.storage.connection().execute(f"SELECT data FROM {self.table} ORDER BY rowid")
+        return self._from_rows(rows)
+
+    def save_all(self, items):
+        """Substitui todos os registros salvos pela lista informada"""
+        try:
+            conn = self.storage.connection()
+            with conn:
+                ids = [item.id for item in items]
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM keep_ids")
+                conn.executemany("INSERT OR IGNORE INTO keep_ids (id) VALUES (?)", [(item_id,) for item_id in ids])
+                conn.execute(f"DELETE FROM {self.table} WHERE id NOT IN (SELECT id FROM keep_ids)")
+                conn.executemany(self.upsert_sql, [self._row(item) for item in items])
+                self._record_change(conn, None)
+            self.refresh()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao salvar {self.table}: {e}")
+            return False
+
+    def get(self, item_id):
+        """Retorna o registro com o ID informado ou None"""
+        rows = self.storage.connection().execute(f"SELECT data FROM {self.table} WHERE id = ?", (item_id,))
+        items = self._from_rows(rows)
+        return items[0] if items else None
+
+    def find_by(self, field, value):
+        """Retorna os registros cujo campo tem o valor informado"""
+        if field not in self.indexed_fields and field != 'id':
+            return [item for item in self.all() if getattr(item, field, None) == value]
+        rows = self.storage.connection().execute(
+            f"SELECT data FROM {self.table} WHERE {field} IS ? ORDER BY rowid", (value,)
+        )
+        return self._from_rows(rows)
+
+    def count(self):
+        return self.storage.connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def count_by(self, field, value):
+        """Conta os registros cujo campo tem o valor informado (ex.: referências a uma mídia)"""
+        if field not in self.indexed_fields and field != 'id':
+            return len(self.find_by(field, value))
+        return self.storage.connection().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {field} IS ?", (value,)
+        ).fetchone()[0]
+
+    def _record_change(self, conn, item_id):
+        cursor = conn.execute("INSERT INTO changes (tbl, item_id) VALUES (?, ?)", (self.table, item_id))
+        if cursor.lastrowid % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (cursor.lastrowid - CHANGE_LOG_KEEP,))
+
+    def subscribe(self, listener):
+        """Registra uma função chamada a cada alteração com o ID do registro (None: todos)"""
+        self.listeners.append(listener)
+
+    def _changed(self, item_id):
+        self.version += 1
+        for listener in self.listeners:
+            try:
+                listener(item_id)
+            except Exception as e:
+                logger.error(f"Erro ao notificar alteração em {self.table}: {e}")
+
+    def refresh(self):
+        """Repassa às funções registradas as alterações gravadas desde a última consulta"""
+        with self.refresh_lock:
+            conn = self.storage.connection()
+            oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            rows = conn.execute("SELECT seq, tbl, item_id FROM changes WHERE seq > ? ORDER BY seq",
+                                (self.last_change_seq,)).fetchall()
+            if oldest is not None and oldest > self.last_change_seq + 1:
+                # Parte do diário foi descartada antes de ser lida
+                self._changed(None)
+            for seq, table, item_id in rows:
+                if table == self.table:
+                    self._changed(item_id)
+                self.last_change_seq = seq
+
+    def _current(self, conn, item_id):
+        row = conn.execute(f"SELECT data FROM {self.table} WHERE id = ?", (item_id,)).fetchone()
+        return self.model.from_dict(json.loads(row[0])) if row else None
+
+    def upsert(self, item):
+        """Insere o registro ou atualiza apenas a linha com o mesmo ID (a última escrita prevalece)"""
+        try:
+            conn = self.storage.connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                current = self._current(conn, item.id)
+                item.rev = (current.rev if current is not None else item.rev or 0) + 1
+                conn.execute(self.upsert_sql, self._row(item))
+                self._record_change(conn, item.id)
+            self.refresh()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao salvar registro em {self.table}: {e}")
+            return False
+
+    def patch(self, item_id, changes, expected_rev=None, deferred=False):
+        """Altera apenas os campos informados de um registro e retorna o registro atualizado.
+
+        Mesma semântica do backend JSON; a transação IMMEDIATE serializa os
+        escritores entre processos. `deferred` é ignorado: a escrita de uma
+        linha já é barata.
+        """
+        try:
+            conn = self.storage.connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                item = self._current(conn, item_id)
+                if item is None:
+                    return None
+                if expected_rev is not None and item.rev != expected_rev:
+                    raise ConflictError(item_id, expected_rev, item.rev)
+                fields = changes(item) if callable(changes) else changes
+                for field, value in fields.items():
+                    setattr(item, field, copy.deepcopy(value))
+                if bumps_revision(self.model, fields):
+                    item.rev = (item.rev or 0) + 1
+                conn.execute(self.upsert_sql, self._row(item))
+                self._record_change(conn, item_id)
+            self.refresh()
+            return item
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao salvar registro em {self.table}: {e}")
+            return None
+
+    def flush(self):
+        return True
+
+    def delete(self, item_id):
+        """Remove o registro com o ID informado; retorna False se ele não existir"""
+        conn = self.storage.connection()
+        with conn:
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (item_id,))
+            if cursor.rowcount > 0:
+                self._record_change(conn, item_id)
+        if cursor.rowcount > 0:
+            self.refresh()
+            return True
+        return False
+
+    def apply_batch(self, operations):
+        """Aplica várias operações em uma única transação; mesma semântica do backend JSON"""
+        try:
+            conn = self.storage.connection()
+            results = []
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for operation in operations:
+                    action, target = operation[0], operation[1]
+                    if action == 'upsert':
+                        current = self._current(conn, target.id)
+                        target.rev = (current.rev if current is not None else target.rev or 0) + 1
+                        conn.execute(self.upsert_sql, self._row(target))
+                        self._record_change(conn, target.id)
+                        result = copy.deepcopy(target)
+                    elif action == 'patch':
+                        changes = operation[2]
+                        expected_rev = operation[3] if len(operation) > 3 else None
+                        result = self._current(conn, target)
+                        if result is not None and expected_rev is not None and result.rev != expected_rev:
+                            result = ConflictError(target, expected_rev, result.rev)
+                        elif result is not None:
+                            fields = changes(result) if callable(changes) else changes
+                            for field, value in fields.items():
+                                setattr(result, field, copy.deepcopy(value))
+                            if bumps_revision(self.model, fields):
+                                result.rev = (result.rev or 0) + 1
+                            conn.execute(self.upsert_sql, self._row(result))
+                            self._record_change(conn, target)
+                    elif action == 'delete':
+                        cursor = conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (target,))
+                        result = True if cursor.rowcount > 0 else None
+                        if result:
+                            self._record_change(conn, target)
+                    else:
+                        raise ValueError(f"Operação desconhecida: {action}")
+                    results.append(result)
+            self.refresh()
+            return results
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao salvar lote em {self.table}: {e}")
+            return None
+
+
+class SqliteDeliveryLog:
+    """Log de entregas somente de inclusão na tabela `deliveries`"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def append(self, post_id, bot_id, chat_id, status, **fields):
+        """Acrescenta um registro de entrega ao log"""
+        entry = make_entry(post_id, bot_id, chat_id, status, **fields)
+        try:
+            conn = self.storage.connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO deliveries (ts, post_id, bot_id, chat_id, status, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry['ts'], post_id, bot_id, entry['chat_id'], status, json.dumps(entry)),
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao registrar entrega no log: {e}")
+        return entry
+
+    def history(self, post_id=None, bot_id=None, chat_id=None, status=None, since=None,
+                limit=DEFAULT_HISTORY_LIMIT):
+        """Retorna os registros mais recentes que atendem aos filtros, do mais novo ao mais antigo"""
+        filters = (('post_id = ?', post_id), ('bot_id = ?', bot_id),
+                   ('chat_id = ?', str(chat_id) if chat_id is not None else None),
+                   ('status = ?', status), ('ts >= ?', since))
+        clauses = [clause for clause, value in filters if value is not None]
+        params = [value for _, value in filters if value is not None]
+        sql = "SELECT data FROM deliveries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self.storage.connection().execute(sql, params)
+        return [json.loads(row[0]) for row in rows]
+
+    def last(self, post_id, chat_id):
+        """Retorna o registro mais recente de uma publicação em um grupo ou None"""
+        entries = self.history(post_id=post_id, chat_id=chat_id, limit=1)
+        return entries[0] if entries else None
+
+
+class SqliteStorage:
+    """Armazenamento em um banco SQLite (modo WAL) no diretório de dados"""
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.local = threading.local()  # uma conexão por thread
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._create_schema()
+
+        for table, model, indexed_fields in TABLES:
+            setattr(self, table, SqliteRepository(self, table, model, indexed_fields))
+        self.deliveries = SqliteDeliveryLog(self)
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "tbl TEXT NOT NULL, item_id TEXT)")
+            for table, _, indexed_fields in TABLES:
+                columns = ''.join(f", {field} TEXT" for field in indexed_fields)
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY{columns}, data TEXT NOT NULL)")
+                self._add_missing_columns(conn, table, indexed_fields)
+                for field in indexed_fields:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ({field})")
+            conn.execute("CREATE TABLE IF NOT EXISTS deliveries (seq INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, "
+                         "post_id TEXT, bot_id TEXT, chat_id TEXT, status TEXT, data TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_post ON deliveries (post_id, chat_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_bot ON deliveries (bot_id)")
+
+    @staticmethod
+    def _add_missing_columns(conn, table, indexed_fields):
+        """Cria as colunas indexadas que faltam em bancos antigos, preenchendo-as a partir de `data`"""
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        missing = [field for field in indexed_fields if field not in existing]
+        if not missing:
+            return
+        for field in missing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {field} TEXT")
+        rows = conn.execute(f"SELECT id, data FROM {table}").fetchall()
+        assignments = ', '.join(f"{field} = ?" for field in missing)
+        conn.executemany(
+            f"UPDATE {table} SET {assignments} WHERE id = ?",
+            [tuple(json.loads(data).get(field) for field in missing) + (item_id,) for item_id, data in rows]
+        )
+        logger.info(f"Colunas {missing} adicionadas à tabela {table}")
+
+    def flush(self):
+        """As escritas no SQLite nunca são adiadas"""
+        return True
+
+    def last_change_seq(self):
+        return self.connection().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def get_meta(self, key):
+        row = self.connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        conn = self.connection()
+        with conn:
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
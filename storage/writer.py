@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class StorageWriter:
+    """Thread dedicada às operações de armazenamento chamadas a partir de código assíncrono.
+
+    As operações são executadas uma de cada vez, na ordem em que foram
+    enviadas, fora do event loop: leituras feitas com `run` enxergam as
+    escritas enviadas antes delas com `submit`. Uma gravação lenta do
+    arquivo nunca bloqueia os envios ou timers em andamento no loop.
+    """
+
+    def __init__(self, name='storage-writer'):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.lock = threading.Lock()
+        self.pending = set()  # chaves de operações coalescidas ainda na fila
+
+    def _call(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Erro na operação de armazenamento {getattr(fn, '__qualname__', fn)}: {e}")
+            raise
+
+    def submit(self, fn, *args, **kwargs):
+        """Enfileira a operação sem aguardar; retorna um concurrent.futures.Future"""
+        return self.executor.submit(self._call, fn, args, kwargs)
+
+    def submit_coalesced(self, key, fn, *args, **kwargs):
+        """Enfileira a operação, a menos que outra com a mesma chave ainda aguarde a vez.
+
+        Serve para gravações que leem o estado atual ao executar (ex.: salvar
+        o estado do agendador): várias chamadas seguidas viram uma escrita.
+        """
+        with self.lock:
+            if key in self.pending:
+                return None
+            self.pending.add(key)
+
+        def run():
+            with self.lock:
+                self.pending.discard(key)
+            return fn(*args, **kwargs)
+
+        return self.submit(run)
+
+    async def run(self, fn, *args, **kwargs):
+        """Executa a operação na thread de armazenamento e aguarda o resultado"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def drain(self, timeout=None):
+        """Aguarda a conclusão das operações enfileiradas até agora"""
+        self.submit(lambda: None).result(timeout=timeout)
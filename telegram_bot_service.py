@@ -1,4 +1,5 @@
 import asyncio
+import copy
 import json
 import os
 import time
@@ -6,10 +7,19 @@ import threading
 from datetime import datetime
 import logging
 from aiogram import Bot
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.exceptions import TelegramAPIError
-from src.models.bot import Bot as BotModel
-from src.models.post import Post
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from src.storage import get_storage
+from src.storage.files import atomic_write_json
+from src.storage.writer import StorageWriter
+from src.utils.scheduler import DeadlineScheduler
+from src.utils.rate_limiter import TelegramRateLimiter
+from src.utils.media_cache import get_file_id_cache
+from src.utils.retry_queue import RetryQueue, backoff_delay, RETRY_MAX_ATTEMPTS
+from src.utils.change_tracker import ChangeTracker
+from src.utils.event_bus import EventBus
 
 # Configurar logging
 logging.basicConfig(
@@ -22,77 +32,123 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Diretório base do projeto, usado para resolver caminhos de mídia locais
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Intervalo mínimo entre envios de uma mesma publicação (segundos)
+MIN_INTERVAL_SECONDS = 5
+
+# Número máximo de grupos atendidos em paralelo por publicação
+MAX_CONCURRENT_SENDS = 8
+
+# Tempo máximo de espera pelo encerramento de um bot (segundos)
+STOP_TIMEOUT_SECONDS = 5
+
+# Tempo máximo de espera pelos envios em andamento ao encerrar o serviço (segundos)
+DRAIN_TIMEOUT_SECONDS = 30
+
+# Atributos da publicação alterados pelos envios, preservados ao recarregar as publicações
+SEND_RESULT_SLOTS = ('_send_status', '_last_sent')
+
 class TelegramBotService:
     def __init__(self, data_dir):
         self.data_dir = data_dir
-        self.bots_file = os.path.join(data_dir, 'bots.json')
-        self.posts_file = os.path.join(data_dir, 'posts.json')
+        self.storage = get_storage(data_dir)
+        # Operações de armazenamento feitas a partir do event loop rodam nesta thread
+        self.writer = StorageWriter()
         self.active_bots = {}  # {bot_id: Bot instance}
         self.is_running = False
-        self.threads = {}  # {bot_id: thread}
+        self.loop = None  # event loop compartilhado por todos os bots
+        self.loop_thread = None  # thread dedicada que executa o loop
+        self.loop_lock = threading.Lock()
+        self.tasks = {}  # {bot_id: asyncio.Task}
+        self.task_states = {}  # {bot_id: {state, since, error}}
+        self.schedule_file = os.path.join(data_dir, 'schedule.json')
         self.last_sent = {}  # {post_id: timestamp}
+        self.next_due = {}  # {post_id: timestamp do próximo envio}
+        self.wakeups = {}  # {bot_id: (event loop, asyncio.Event)}
+        self.rate_limiters = {}  # {bot_id: TelegramRateLimiter}
+        self.file_ids = get_file_id_cache(os.path.join(data_dir, 'file_ids.json'))
+        self.upload_locks = {}  # {(bot_id, media_url): asyncio.Lock}
+        self.retry_queues = {}  # {bot_id: RetryQueue}
+        self.bot_posts = {}  # {bot_id: {post_id: Post}} publicações agendadas de cada bot
+        self.send_requests = {}  # {bot_id: {post_id}} envios antecipados (usado só no event loop)
+        self.sends = {}  # {bot_id: {post_id: asyncio.Task}} envios em andamento
+        self.draining = False  # encerrando: nenhum envio novo é iniciado
+        
+        # Versão do estado exibido nos painéis (publicações, bots, horários e tarefas)
+        self.changes = ChangeTracker()
+        self.storage.posts.subscribe(lambda post_id: self.changes.touch(('post', post_id) if post_id else None))
+        self.storage.bots.subscribe(lambda bot_id: self.changes.touch(('bot', bot_id) if bot_id else None))
+        # Eventos de entrega transmitidos ao painel em tempo real
+        self.events = EventBus()
         
-        # Garantir que os arquivos existam
-        self._ensure_files_exist()
-    
-    def _ensure_files_exist(self):
-        """Garante que os arquivos necessários existam"""
         os.makedirs(self.data_dir, exist_ok=True)
-        
-        if not os.path.exists(self.bots_file):
-            with open(self.bots_file, 'w') as f:
-                json.dump([], f)
-            logger.info(f"Arquivo de bots criado: {self.bots_file}")
-        
-        if not os.path.exists(self.posts_file):
-            with open(self.posts_file, 'w') as f:
-                json.dump([], f)
-            logger.info(f"Arquivo de posts criado: {self.posts_file}")
+        self._load_schedule_state()
     
-    def load_bots(self):
-        """Carrega os bots cadastrados"""
-        self._ensure_files_exist()
-        
+    def _load_schedule_state(self):
+        """Restaura os horários de último envio e próximo envio salvos antes do reinício"""
         try:
-            with open(self.bots_file, 'r') as f:
+            with open(self.schedule_file, 'r') as f:
                 data = json.load(f)
-                return [BotModel.from_dict(bot_data) for bot_data in data]
+        except FileNotFoundError:
+            return
         except Exception as e:
-            logger.error(f"Erro ao carregar bots: {e}")
-            # Se houver erro, retorna lista vazia e recria o arquivo
-            with open(self.bots_file, 'w') as f:
-                json.dump([], f)
-            return []
+            logger.error(f"Erro ao carregar estado do agendador: {e}")
+            return
+        
+        for post_id, state in data.items():
+            if state.get('last_sent') is not None:
+                self.last_sent[post_id] = state['last_sent']
+            if state.get('next_due') is not None:
+                self.next_due[post_id] = state['next_due']
     
-    def load_posts(self):
-        """Carrega as publicações salvas"""
-        self._ensure_files_exist()
+    def _save_schedule_state(self):
+        """Persiste os horários do agendador para sobreviver a reinícios.
+        
+        A gravação roda na thread de armazenamento; chamadas seguidas antes
+        dela começar resultam em uma única escrita com o estado mais recente.
+        """
+        self.writer.submit_coalesced('schedule_state', self._write_schedule_state)
+    
+    def _write_schedule_state(self):
+        state = {}
+        for post_id, timestamp in list(self.last_sent.items()):
+            state.setdefault(post_id, {})['last_sent'] = timestamp
+        for post_id, timestamp in list(self.next_due.items()):
+            state.setdefault(post_id, {})['next_due'] = timestamp
         
         try:
-            with open(self.posts_file, 'r') as f:
-                data = json.load(f)
-                return [Post.from_dict(post_data) for post_data in data]
+            atomic_write_json(self.schedule_file, state)
         except Exception as e:
-            logger.error(f"Erro ao carregar publicações: {e}")
-            # Se houver erro, retorna lista vazia e recria o arquivo
-            with open(self.posts_file, 'w') as f:
-                json.dump([], f)
-            return []
+            logger.error(f"Erro ao salvar estado do agendador: {e}")
+    
+    def load_bots(self):
+        """Carrega os bots cadastrados"""
+        return self.storage.bots.all()
+    
+    def load_posts(self):
+        """Carrega as publicações salvas"""
+        return self.storage.posts.all()
     
     def save_posts(self, posts):
         """Salva as publicações com status atualizado"""
-        self._ensure_files_exist()
-        
-        try:
-            with open(self.posts_file, 'w') as f:
-                json.dump([post.to_dict() for post in posts], f, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao salvar publicações: {e}")
-            return False
+        return self.storage.posts.save_all(posts)
+    
+    def _get_rate_limiter(self, bot_id):
+        """Retorna o limitador de envios do bot, criando-o se necessário"""
+        limiter = self.rate_limiters.get(bot_id)
+        if limiter is None:
+            limiter = TelegramRateLimiter()
+            self.rate_limiters[bot_id] = limiter
+        return limiter
     
     async def send_post(self, bot_instance, post):
-        """Envia uma publicação para os grupos configurados usando o bot especificado"""
+        """Envia uma publicação para os grupos configurados usando o bot especificado.
+        
+        Os grupos são atendidos em paralelo, limitados por MAX_CONCURRENT_SENDS
+        e pelo limitador de taxa do bot.
+        """
         if not bot_instance:
             logger.error(f"Bot não inicializado para a publicação {post.id}")
             return False
@@ -101,8 +157,7 @@ class TelegramBotService:
         groups = post.groups
         if not groups:
             # Encontrar o bot correspondente para obter grupos padrão
-            bots = self.load_bots()
-            bot = next((b for b in bots if b.id == post.bot_id), None)
+            bot = await self.writer.run(self.storage.bots.get, post.bot_id)
             if bot:
                 groups = bot.default_groups
         
@@ -111,170 +166,280 @@ class TelegramBotService:
             return False
         
         # Preparar botão inline se configurado
-        reply_markup = None
-        if post.button_text and post.button_url:
-            reply_markup = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text=post.button_text, url=post.button_url)]
-            ])
+        reply_markup = self._build_reply_markup(post)
+        
+        # Um envio completo substitui as tentativas pendentes desta publicação
+        retries = self.retry_queues.get(post.bot_id)
+        if retries:
+            retries.discard_post(post.id)
         
         # Atualizar o status de envio
         now = datetime.now()
         post.last_sent = now
         post.send_status = post.send_status or {}
-        post.send_history = post.send_history or {}
+        post.prune_send_status(groups)
+        self._publish_event("send_started", post, groups=[str(chat_id) for chat_id in groups])
         
-        # Resultados do envio para cada grupo
-        results = {}
+        limiter = self._get_rate_limiter(post.bot_id)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
         
-        for chat_id in groups:
-            try:
-                # Converter string para int se necessário
-                if isinstance(chat_id, str) and chat_id.strip('-').isdigit():
-                    chat_id = int(chat_id)
-                
-                # Se auto_delete estiver ativado, deletar a última mensagem enviada
-                if post.auto_delete:
-                    await self._delete_last_message(bot_instance, post.id, chat_id)
-                
-                # Enviar a nova mensagem
-                message = None
-                if post.media_type == 'photo':
-                    message = await bot_instance.send_photo(
-                        chat_id=chat_id,
-                        photo=post.media_url,
-                        caption=post.caption,
-                        reply_markup=reply_markup,
-                        parse_mode="HTML"
-                    )
-                elif post.media_type == 'video':
-                    message = await bot_instance.send_video(
-                        chat_id=chat_id,
-                        video=post.media_url,
-                        caption=post.caption,
-                        reply_markup=reply_markup,
-                        parse_mode="HTML"
-                    )
-                elif post.media_type == 'text':
-                    message = await bot_instance.send_message(
-                        chat_id=chat_id,
-                        text=post.caption,
-                        reply_markup=reply_markup,
-                        parse_mode="HTML"
-                    )
-                
-                # Registrar o ID da mensagem para possível deleção futura
-                if message:
-                    # Inicializar histórico para este grupo se não existir
-                    if str(chat_id) not in post.send_history:
-                        post.send_history[str(chat_id)] = {}
-                    
-                    # Registrar o ID da mensagem enviada
-                    post.send_history[str(chat_id)] = {
-                        'message_id': message.message_id,
-                        'last_sent': now.isoformat(),
-                        'status': 'success'
-                    }
-                
-                # Registrar sucesso
-                post.send_status[str(chat_id)] = {
-                    "status": "success",
-                    "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
-                    "message": "Enviado com sucesso"
-                }
-                results[str(chat_id)] = {"status": "success", "message_id": message.message_id if message else None}
-                logger.info(f"Publicação {post.id} enviada para o grupo {chat_id} pelo bot {post.bot_id}")
-            
-            except TelegramAPIError as e:
-                # Registrar erro do Telegram
-                error_msg = str(e)
-                post.send_status[str(chat_id)] = {
-                    "status": "failed",
-                    "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
-                    "message": f"Erro do Telegram: {error_msg}"
-                }
-                results[str(chat_id)] = {"status": "error", "error": error_msg}
-                logger.error(f"Erro do Telegram ao enviar para o grupo {chat_id}: {e}")
-                
-                # Registrar falha no histórico
-                if str(chat_id) not in post.send_history:
-                    post.send_history[str(chat_id)] = {}
-                
-                post.send_history[str(chat_id)]['status'] = 'error'
-                post.send_history[str(chat_id)]['error'] = error_msg
-                post.send_history[str(chat_id)]['last_attempt'] = now.isoformat()
-            
-            except Exception as e:
-                # Registrar erro genérico
-                error_msg = str(e)
-                post.send_status[str(chat_id)] = {
-                    "status": "failed",
-                    "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
-                    "message": f"Erro inesperado: {error_msg}"
-                }
-                results[str(chat_id)] = {"status": "error", "error": error_msg}
-                logger.error(f"Erro inesperado ao enviar para o grupo {chat_id}: {e}")
-                
-                # Registrar falha no histórico
-                if str(chat_id) not in post.send_history:
-                    post.send_history[str(chat_id)] = {}
-                
-                post.send_history[str(chat_id)]['status'] = 'error'
-                post.send_history[str(chat_id)]['error'] = error_msg
-                post.send_history[str(chat_id)]['last_attempt'] = now.isoformat()
+        async def send_limited(chat_id):
+            async with semaphore:
+                return await self._send_to_group(bot_instance, limiter, post, chat_id, reply_markup, now)
+        
+        # Resultados do envio para cada grupo
+        results = dict(await asyncio.gather(*(send_limited(chat_id) for chat_id in groups)))
         
         # Atualizar o timestamp do último envio
         self.last_sent[post.id] = time.time()
+        self.changes.touch(('post', post.id))
+        self._save_schedule_state()
         
         # Salvar as publicações com status atualizado
-        posts = self.load_posts()
-        for i, p in enumerate(posts):
-            if p.id == post.id:
-                posts[i] = post
-                break
-        self.save_posts(posts)
+        self._save_post(post)
         
         return {"status": "success", "results": results}
+    
+    def _build_reply_markup(self, post):
+        if post.button_text and post.button_url:
+            return InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text=post.button_text, url=post.button_url)]
+            ])
+        return None
+    
+    def _save_post(self, post):
+        """Grava o resultado do envio (status por grupo e último envio) na publicação.
+        
+        Apenas esses campos são alterados, sobre a versão mais recente do
+        registro, para não desfazer edições feitas pelo painel enquanto a
+        publicação era enviada. A gravação é adiada para ser agrupada com os
+        resultados de outros envios que terminarem logo em seguida.
+        """
+        self.writer.submit(self.storage.posts.patch, post.id, {
+            'send_status': copy.deepcopy(post.send_status),
+            'last_sent': post.last_sent
+        }, deferred=True)
+    
+    async def _send_to_group(self, bot_instance, limiter, post, chat_id, reply_markup, now, attempt=1):
+        """Envia a publicação para um único grupo e registra o resultado na publicação.
         
-    async def _delete_last_message(self, bot_instance, post_id, chat_id):
-        """Deleta a última mensagem enviada para um grupo específico"""
+        Flood waits e falhas transitórias de rede/servidor são reagendados na
+        fila de reenvio do bot em vez de marcados como falha.
+        """
         try:
-            # Carregar a publicação para obter o histórico
-            posts = self.load_posts()
-            post = next((p for p in posts if p.id == post_id), None)
+            # Converter string para int se necessário
+            if isinstance(chat_id, str) and chat_id.strip('-').isdigit():
+                chat_id = int(chat_id)
             
-            if not post or not post.send_history:
-                logger.info(f"Nenhum histórico de envio encontrado para a publicação {post_id}")
-                return False
+            # Se auto_delete estiver ativado, deletar a última mensagem enviada
+            if post.auto_delete:
+                await self._delete_last_message(bot_instance, post, chat_id)
             
-            # Verificar se há histórico para este grupo
-            chat_id_str = str(chat_id)
-            if chat_id_str not in post.send_history:
-                logger.info(f"Nenhum histórico de envio encontrado para o grupo {chat_id} na publicação {post_id}")
-                return False
+            # Aguardar a vez deste chat respeitando os limites do Telegram
+            await limiter.acquire(chat_id)
+            
+            # Enviar a nova mensagem
+            message = await self._send_message(bot_instance, post, chat_id, reply_markup)
+            
+            # Registrar sucesso e o ID da mensagem para possível deleção futura
+            message_id = message.message_id if message else None
+            self._record_result(post, chat_id, now, "success", "Enviado com sucesso",
+                                message_id=message_id, deleted=None, attempt=attempt)
+            logger.info(f"Publicação {post.id} enviada para o grupo {chat_id} pelo bot {post.bot_id}")
+            return str(chat_id), {"status": "success", "message_id": message_id}
+        
+        except TelegramRetryAfter as e:
+            # Flood wait: suspender todo o pipeline do bot até o prazo informado
+            limiter.pause(e.retry_after)
+            logger.warning(f"Flood wait de {e.retry_after}s no bot {post.bot_id} ao enviar para o grupo {chat_id}")
+            return str(chat_id), self._schedule_retry(post, chat_id, now, attempt, e.retry_after,
+                                                      f"Limite do Telegram atingido: {e}")
+        
+        except (TelegramNetworkError, TelegramServerError) as e:
+            logger.warning(f"Erro temporário ao enviar para o grupo {chat_id} (tentativa {attempt}): {e}")
+            return str(chat_id), self._schedule_retry(post, chat_id, now, attempt + 1, None,
+                                                      f"Erro temporário do Telegram: {e}")
+        
+        except TelegramAPIError as e:
+            logger.error(f"Erro do Telegram ao enviar para o grupo {chat_id}: {e}")
+            return str(chat_id), self._record_failure(post, chat_id, now, f"Erro do Telegram: {e}", str(e))
+        
+        except Exception as e:
+            logger.error(f"Erro inesperado ao enviar para o grupo {chat_id}: {e}")
+            return str(chat_id), self._record_failure(post, chat_id, now, f"Erro inesperado: {e}", str(e))
+    
+    def _media_input(self, media_url):
+        """Converte o caminho da mídia no valor aceito pela API (arquivo local ou URL)"""
+        if media_url and not media_url.startswith(('http://', 'https://')) and not os.path.isabs(media_url):
+            local_path = os.path.join(BASE_DIR, media_url)
+            if os.path.exists(local_path):
+                return FSInputFile(local_path)
+        return media_url
+    
+    def _extract_file_id(self, message, media_type):
+        """Obtém o file_id da mídia de uma mensagem enviada"""
+        if media_type == 'photo' and message.photo:
+            return message.photo[-1].file_id
+        if media_type == 'video':
+            media = message.video or message.animation or message.document
+            return media.file_id if media else None
+        return None
+    
+    async def _send_media(self, bot_instance, post, chat_id, reply_markup, media):
+        if post.media_type == 'photo':
+            return await bot_instance.send_photo(
+                chat_id=chat_id,
+                photo=media,
+                caption=post.caption,
+                reply_markup=reply_markup,
+                parse_mode="HTML"
+            )
+        return await bot_instance.send_video(
+            chat_id=chat_id,
+            video=media,
+            caption=post.caption,
+            reply_markup=reply_markup,
+            parse_mode="HTML"
+        )
+    
+    async def _send_message(self, bot_instance, post, chat_id, reply_markup):
+        """Envia a mensagem da publicação, reutilizando o file_id da mídia quando conhecido.
+        
+        A primeira transferência de cada mídia por bot é serializada: os demais
+        grupos aguardam o file_id dela em vez de enviar o arquivo novamente.
+        """
+        if post.media_type == 'text':
+            return await bot_instance.send_message(
+                chat_id=chat_id,
+                text=post.caption,
+                reply_markup=reply_markup,
+                parse_mode="HTML"
+            )
+        
+        if post.media_type not in ('photo', 'video'):
+            return None
+        
+        file_id = await self.writer.run(self.file_ids.get, post.bot_id, post.media_url)
+        if file_id:
+            try:
+                return await self._send_media(bot_instance, post, chat_id, reply_markup, file_id)
+            except TelegramBadRequest as e:
+                # file_id rejeitado (ex.: expirado): descartar e enviar o arquivo de novo
+                logger.warning(f"file_id inválido para a mídia {post.media_url} no bot {post.bot_id}: {e}")
+                self.writer.submit(self.file_ids.invalidate, post.media_url, post.bot_id)
+        
+        lock = self.upload_locks.setdefault((post.bot_id, post.media_url), asyncio.Lock())
+        async with lock:
+            # Outro grupo pode ter concluído a transferência enquanto aguardávamos
+            file_id = await self.writer.run(self.file_ids.get, post.bot_id, post.media_url)
+            if file_id:
+                return await self._send_media(bot_instance, post, chat_id, reply_markup, file_id)
             
-            # Obter o ID da última mensagem enviada
-            chat_history = post.send_history[chat_id_str]
-            if 'message_id' not in chat_history or chat_history.get('status') != 'success':
-                logger.info(f"Nenhuma mensagem válida para deletar no grupo {chat_id}")
+            message = await self._send_media(bot_instance, post, chat_id, reply_markup, self._media_input(post.media_url))
+            file_id = self._extract_file_id(message, post.media_type)
+            if file_id:
+                self.writer.submit(self.file_ids.put, post.bot_id, post.media_url, file_id)
+            return message
+    
+    def _schedule_retry(self, post, chat_id, now, attempt, delay, error_msg):
+        """Agenda uma nova tentativa do grupo ou registra a falha se as tentativas acabaram.
+        
+        `attempt` é o número da próxima tentativa; flood waits não consomem tentativas.
+        """
+        retries = self.retry_queues.get(post.bot_id)
+        if retries is None or attempt > RETRY_MAX_ATTEMPTS:
+            return self._record_failure(post, chat_id, now, error_msg, error_msg)
+        
+        if delay is None:
+            delay = backoff_delay(attempt - 1)
+        retries.push(post.id, str(chat_id), delay, attempt)
+        
+        self._record_result(post, chat_id, now, "retrying", f"{error_msg} (nova tentativa em {delay:.0f}s)",
+                            error=error_msg, next_attempt=attempt, retry_in=round(delay, 1))
+        return {"status": "retrying", "error": error_msg, "retry_in": delay}
+    
+    async def _retry_group(self, bot_instance, post, chat_id, attempt):
+        """Executa uma tentativa de reenvio da publicação para um grupo"""
+        limiter = self._get_rate_limiter(post.bot_id)
+        _, result = await self._send_to_group(bot_instance, limiter, post, chat_id,
+                                              self._build_reply_markup(post), datetime.now(), attempt)
+        self._save_post(post)
+        return result
+    
+    async def _run_retry_queue(self, bot_id, bot_instance, retries):
+        """Processa a fila de reenvios de um bot enquanto ele estiver em execução"""
+        while True:
+            for post_id, chat_id, attempt in retries.pop_due(time.time()):
+                post = self.bot_posts.get(bot_id, {}).get(post_id)
+                if not post or self.draining:
+                    continue
+                logger.info(f"Reenviando publicação {post_id} para o grupo {chat_id} (tentativa {attempt})")
+                retries.track(asyncio.create_task(self._retry_group(bot_instance, post, chat_id, attempt)))
+            await retries.wait()
+    
+    def _record_failure(self, post, chat_id, now, status_message, error_msg):
+        """Registra uma falha de envio no resumo da publicação e no log de entregas"""
+        self._record_result(post, chat_id, now, "failed", status_message, error=error_msg)
+        return {"status": "error", "error": error_msg}
+    
+    def _record_result(self, post, chat_id, now, status, message, message_id=None, deleted=None, **fields):
+        """Atualiza o último resultado do grupo na publicação e acrescenta o evento ao log de entregas.
+        
+        A publicação guarda apenas o resumo do último resultado por grupo; o
+        ID da última mensagem enviada é mantido entre falhas para que a
+        deleção automática ainda a encontre. O histórico completo fica no log.
+        """
+        chat_key = str(chat_id)
+        previous = post.send_status.get(chat_key, {})
+        summary = {
+            "status": status,
+            "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
+            "message": message
+        }
+        if message_id is None:
+            message_id = previous.get('message_id')
+            deleted = previous.get('deleted')
+        if message_id is not None:
+            summary['message_id'] = message_id
+            if deleted:
+                summary['deleted'] = True
+        post.send_status[chat_key] = summary
+        
+        self.writer.submit(self.storage.deliveries.append, post.id, post.bot_id, chat_key, status,
+                           message_id=message_id if status == "success" else None, **fields)
+        self._publish_event("delivery", post, chat_id=chat_key, status=status, message=message,
+                            timestamp=summary["timestamp"],
+                            message_id=message_id if status == "success" else None, **fields)
+    
+    def _publish_event(self, event_type, post, **data):
+        """Publica um evento de entrega da publicação para os painéis conectados"""
+        data = {key: value for key, value in data.items() if value is not None}
+        self.events.publish(event_type, dict(post_id=post.id, bot_id=post.bot_id, user_id=post.user_id, **data))
+        
+    async def _delete_last_message(self, bot_instance, post, chat_id):
+        """Deleta a última mensagem enviada para um grupo específico.
+        
+        Usa o resumo da publicação em memória; o registro da deleção é
+        salvo junto com o resultado do envio.
+        """
+        post_id = post.id
+        try:
+            chat_status = post.send_status.get(str(chat_id))
+            if not chat_status or chat_status.get('message_id') is None or chat_status.get('deleted'):
+                logger.info(f"Nenhuma mensagem válida para deletar no grupo {chat_id} na publicação {post_id}")
                 return False
             
-            message_id = chat_history['message_id']
+            message_id = chat_status['message_id']
             
             # Deletar a mensagem
             await bot_instance.delete_message(chat_id=chat_id, message_id=message_id)
             logger.info(f"Mensagem {message_id} deletada do grupo {chat_id} para a publicação {post_id}")
             
-            # Atualizar o histórico
-            chat_history['deleted'] = True
-            chat_history['deleted_at'] = datetime.now().isoformat()
-            
-            # Salvar as alterações
-            for i, p in enumerate(posts):
-                if p.id == post_id:
-                    posts[i].send_history[chat_id_str] = chat_history
-                    break
-            
-            self.save_posts(posts)
+            # Atualizar o resumo e o log de entregas
+            chat_status['deleted'] = True
+            self.writer.submit(self.storage.deliveries.append, post_id, post.bot_id, chat_id, "deleted",
+                               message_id=message_id)
+            self._publish_event("deleted", post, chat_id=str(chat_id), message_id=message_id)
             return True
         
         except TelegramAPIError as e:
@@ -284,51 +449,320 @@ class TelegramBotService:
             logger.error(f"Erro inesperado ao deletar mensagem do grupo {chat_id}: {e}")
             return False
     
+    def _post_interval(self, post):
+        """Retorna o intervalo de envio de uma publicação, respeitando o mínimo"""
+        try:
+            interval = int(post.interval_seconds)
+        except (TypeError, ValueError):
+            interval = 0
+        return max(interval, MIN_INTERVAL_SECONDS)
+    
+    def _next_due_for(self, post, now):
+        """Calcula o próximo envio de uma publicação a partir do estado salvo"""
+        planned = self.next_due.get(post.id)
+        natural = None
+        if post.id in self.last_sent:
+            natural = self.last_sent[post.id] + self._post_interval(post)
+        
+        # Ainda no prazo: respeitar o intervalo atual (ele pode ter sido alterado)
+        if natural is not None and natural > now:
+            return natural
+        if planned is not None:
+            return planned
+        # Atrasada ou nunca enviada
+        return natural if natural is not None else now
+    
+    def _schedule_post(self, schedule, post_id, due):
+        schedule.schedule(post_id, due)
+        self.next_due[post_id] = due
+        self.changes.touch(('post', post_id))
+    
+    def _fetch_bot_posts(self, bot_id):
+        """Lê as publicações ativas do bot (executado na thread de armazenamento)"""
+        # Cópias próprias: o loop altera o status das publicações durante os envios
+        return {post.id: copy.deepcopy(post) for post in self.storage.posts.find_by('bot_id', bot_id)
+                if post.active}
+    
+    @staticmethod
+    def _update_loaded_post(post, fresh):
+        """Aplica as edições lidas do armazenamento sobre a publicação em memória.
+        
+        O resultado dos envios (status por grupo e último envio) é mantido: este
+        processo é o único que o altera, e a cópia em memória pode estar à frente
+        da gravada.
+        """
+        for slot in type(post).__slots__:
+            if slot not in SEND_RESULT_SLOTS:
+                setattr(post, slot, getattr(fresh, slot))
+    
+    async def _reload_schedule(self, bot_id, schedule, warm_start=False):
+        """Recarrega as publicações do bot e sincroniza a fila de prazos.
+        
+        Na partida do bot (`warm_start`), as publicações atrasadas são
+        espalhadas ao longo do próprio intervalo em vez de enviadas de uma vez.
+        """
+        posts = await self.writer.run(self._fetch_bot_posts, bot_id)
+        
+        # Manter os objetos das publicações já carregadas: os envios em andamento
+        # gravam neles o resultado, inclusive o ID da mensagem usado pela deleção automática
+        loaded = self.bot_posts.get(bot_id, {})
+        for post_id, fresh in posts.items():
+            post = loaded.get(post_id)
+            if post is not None:
+                self._update_loaded_post(post, fresh)
+                posts[post_id] = post
+        
+        # Descartar prazos de publicações removidas, desativadas ou movidas
+        for post_id in schedule.keys():
+            if post_id not in posts:
+                schedule.cancel(post_id)
+        
+        # Recalcular o próximo envio (o intervalo pode ter mudado)
+        now = time.time()
+        overdue = []
+        for post_id, post in posts.items():
+            due = self._next_due_for(post, now)
+            if warm_start and due <= now:
+                overdue.append((due, post_id))
+            else:
+                self._schedule_post(schedule, post_id, due)
+        
+        overdue.sort()
+        for position, (_, post_id) in enumerate(overdue):
+            offset = self._post_interval(posts[post_id]) * position / len(overdue)
+            self._schedule_post(schedule, post_id, now + offset)
+        
+        if warm_start:
+            self._save_schedule_state()
+        
+        return posts
+    
+    def notify_posts_changed(self, bot_ids=None):
+        """Acorda o agendador dos bots informados (ou de todos) para recarregar as publicações.
+        
+        Pode ser chamado de qualquer thread, por exemplo pelas rotas Flask após
+        criar, editar ou excluir uma publicação.
+        """
+        if bot_ids is None:
+            bot_ids = list(self.wakeups.keys())
+        
+        for bot_id in bot_ids:
+            wakeup = self.wakeups.get(bot_id)
+            if not wakeup:
+                continue
+            loop, event = wakeup
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop já encerrado
+                pass
+    
+    def send_now(self, post_id):
+        """Antecipa o próximo envio da publicação para agora.
+        
+        Retorna False se a publicação não existir, estiver inativa ou se o
+        bot dela não estiver em execução.
+        """
+        post = self.storage.posts.get(post_id)
+        if not post or not post.active:
+            return False
+        wakeup = self.wakeups.get(post.bot_id)
+        if not wakeup:
+            return False
+        loop, event = wakeup
+        
+        def request_send():
+            self.send_requests.setdefault(post.bot_id, set()).add(post_id)
+            event.set()
+        
+        try:
+            loop.call_soon_threadsafe(request_send)
+        except RuntimeError:
+            # Loop já encerrado
+            return False
+        return True
+    
+    def subscribe_events(self, last_event_id=None):
+        """Assina os eventos de entrega (ver EventBus.subscribe)"""
+        return self.events.subscribe(last_event_id)
+    
     async def run_bot(self, bot_id, bot_token):
-        """Executa o loop principal de um bot específico"""
+        """Executa o loop principal de um bot específico.
+        
+        As publicações ficam em uma fila ordenada pelo próximo envio; o loop
+        dorme até o prazo mais próximo ou até ser acordado por
+        `notify_posts_changed`, quando recarrega as publicações do bot.
+        Roda como tarefa no event loop compartilhado e termina ao ser cancelada.
+        """
+        in_flight = self.sends[bot_id] = {}  # {post_id: asyncio.Task}
+        retry_task = None
         try:
             bot_instance = Bot(token=bot_token)
             self.active_bots[bot_id] = bot_instance
+            wakeup = asyncio.Event()
+            self.wakeups[bot_id] = (asyncio.get_running_loop(), wakeup)
+            schedule = DeadlineScheduler()
+            posts = self.bot_posts[bot_id] = await self._reload_schedule(bot_id, schedule, warm_start=True)
+            retries = self.retry_queues[bot_id] = RetryQueue()
+            retry_task = asyncio.create_task(self._run_retry_queue(bot_id, bot_instance, retries))
             logger.info(f"Bot {bot_id} inicializado com sucesso")
             
-            while self.is_running and bot_id in self.active_bots:
-                posts = self.load_posts()
-                current_time = time.time()
-                
-                # Filtrar publicações para este bot
-                bot_posts = [post for post in posts if post.bot_id == bot_id]
-                
-                for post in bot_posts:
-                    post_id = post.id
-                    interval = int(post.interval_seconds)
+            while True:
+                for post_id in schedule.pop_due(time.time()):
+                    post = posts.get(post_id)
+                    if not post:
+                        continue
+                    
+                    # O próximo prazo conta a partir do início deste envio
+                    self._schedule_post(schedule, post_id, time.time() + self._post_interval(post))
                     
-                    # Verificar se é hora de enviar esta publicação
-                    last_sent = self.last_sent.get(post_id, 0)
-                    if current_time - last_sent >= interval:
-                        logger.info(f"Enviando publicação {post_id} pelo bot {bot_id}")
-                        await self.send_post(bot_instance, post)
+                    # Se o envio anterior ainda estiver em andamento, pular este ciclo
+                    if post_id in in_flight or self.draining:
+                        continue
+                    
+                    # Cada envio roda em sua própria tarefa para não bloquear as demais publicações
+                    logger.info(f"Enviando publicação {post_id} pelo bot {bot_id}")
+                    task = asyncio.create_task(self.send_post(bot_instance, post))
+                    in_flight[post_id] = task
+                    task.add_done_callback(lambda t, post_id=post_id: self._on_send_done(bot_id, post_id, t, in_flight))
+                
+                # Dormir até o próximo prazo ou até ser acordado
+                next_due = schedule.next_due()
+                timeout = max(next_due - time.time(), 0) if next_due is not None else None
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
                 
-                # Aguardar um pouco antes de verificar novamente
-                await asyncio.sleep(5)
+                if wakeup.is_set():
+                    wakeup.clear()
+                    posts = self.bot_posts[bot_id] = await self._reload_schedule(bot_id, schedule)
+                    # Envios antecipados com `send_now` valem sobre os prazos recalculados
+                    for post_id in self.send_requests.pop(bot_id, ()):
+                        if post_id in posts:
+                            self._schedule_post(schedule, post_id, time.time())
         
         except Exception as e:
             logger.error(f"Erro no loop principal do bot {bot_id}: {e}")
+            raise
         finally:
+            self.wakeups.pop(bot_id, None)
+            self.bot_posts.pop(bot_id, None)
+            self.send_requests.pop(bot_id, None)
+            self.sends.pop(bot_id, None)
+            if retry_task:
+                retry_task.cancel()
+                await asyncio.gather(retry_task, return_exceptions=True)
+            retries = self.retry_queues.pop(bot_id, None)
+            if retries:
+                await retries.close()
+            for task in list(in_flight.values()):
+                task.cancel()
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
             if bot_id in self.active_bots:
-                session = await self.active_bots[bot_id].get_session()
-                await session.close()
+                await self.active_bots[bot_id].session.close()
                 del self.active_bots[bot_id]
             logger.info(f"Bot {bot_id} finalizado")
     
+    def _on_send_done(self, bot_id, post_id, task, in_flight):
+        """Libera a publicação ao fim de um envio e registra erros não tratados"""
+        in_flight.pop(post_id, None)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Erro ao enviar publicação {post_id} pelo bot {bot_id}: {task.exception()}")
+    
+    def _ensure_loop(self):
+        """Inicia, se necessário, o event loop compartilhado por todos os bots"""
+        with self.loop_lock:
+            if self.loop and self.loop_thread and self.loop_thread.is_alive():
+                return self.loop
+            
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(
+                target=self._run_event_loop,
+                args=(self.loop,),
+                name="telegram-bot-engine",
+                daemon=True
+            )
+            self.loop_thread.start()
+            return self.loop
+    
+    def _run_event_loop(self, loop):
+        """Executa o event loop compartilhado na thread dedicada"""
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+    
+    def _call_in_loop(self, coro, timeout=STOP_TIMEOUT_SECONDS):
+        """Executa uma corrotina no event loop compartilhado e aguarda o resultado"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout=timeout)
+    
+    def _set_task_state(self, bot_id, state, error=None):
+        self.task_states[bot_id] = {
+            "state": state,
+            "since": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "error": error
+        }
+        self.changes.touch(('bot', bot_id))
+    
+    async def _bot_task(self, bot_id, bot_token):
+        """Envolve run_bot registrando o estado da tarefa do bot"""
+        self._set_task_state(bot_id, "running")
+        try:
+            await self.run_bot(bot_id, bot_token)
+            self._set_task_state(bot_id, "stopped")
+        except asyncio.CancelledError:
+            self._set_task_state(bot_id, "stopped")
+            raise
+        except Exception as e:
+            self._set_task_state(bot_id, "failed", str(e))
+        finally:
+            if self.tasks.get(bot_id) is asyncio.current_task():
+                del self.tasks[bot_id]
+    
+    async def _spawn_bot(self, bot_id, bot_token):
+        if bot_id in self.tasks:
+            return False
+        self._set_task_state(bot_id, "starting")
+        self.tasks[bot_id] = asyncio.create_task(self._bot_task(bot_id, bot_token), name=f"bot-{bot_id}")
+        return True
+    
+    async def _cancel_bot(self, bot_id):
+        task = self.tasks.get(bot_id)
+        if not task:
+            return False
+        self._set_task_state(bot_id, "stopping")
+        task.cancel()
+        await asyncio.wait({task}, timeout=STOP_TIMEOUT_SECONDS)
+        return True
+    
+    def is_bot_running(self, bot_id):
+        """Indica se existe uma tarefa ativa para o bot"""
+        task = self.tasks.get(bot_id)
+        return task is not None and not task.done()
+    
+    def bot_state(self, bot_id):
+        """Retorna o estado da tarefa de um bot (starting, running, stopping, stopped ou failed)"""
+        return self.task_states.get(bot_id, {"state": "stopped", "since": None, "error": None})
+    
+    def _save_bot_active_flag(self, bot_id, is_active):
+        """Atualiza o campo is_active do bot no armazenamento"""
+        if not self.storage.bots.get(bot_id):
+            return
+        
+        if not self.storage.bots.patch(bot_id, {'is_active': is_active, 'updated_at': datetime.now()}):
+            logger.error(f"Erro ao salvar status do bot {bot_id}")
+    
     def start_bot(self, bot_id):
-        """Inicia um bot específico em uma thread separada"""
-        if bot_id in self.threads and self.threads[bot_id].is_alive():
+        """Inicia um bot específico como uma tarefa no event loop compartilhado"""
+        if self.is_bot_running(bot_id):
             logger.warning(f"Bot {bot_id} já está em execução")
             return False
         
         # Carregar informações do bot
-        bots = self.load_bots()
-        bot = next((b for b in bots if b.id == bot_id), None)
+        bot = self.storage.bots.get(bot_id)
         
         if not bot:
             logger.error(f"Bot {bot_id} não encontrado")
@@ -339,60 +773,53 @@ class TelegramBotService:
             return False
         
         self.is_running = True
-        self.threads[bot_id] = threading.Thread(
-            target=self._run_async_loop_for_bot, 
-            args=(bot_id, bot.token)
-        )
-        self.threads[bot_id].daemon = True
-        self.threads[bot_id].start()
+        if not self._call_in_loop(self._spawn_bot(bot_id, bot.token)):
+            logger.warning(f"Bot {bot_id} já está em execução")
+            return False
         
         # Atualizar status do bot
-        for i, b in enumerate(bots):
-            if b.id == bot_id:
-                bots[i].is_active = True
-                bots[i].updated_at = datetime.now()
-                break
-        
-        try:
-            with open(self.bots_file, 'w') as f:
-                json.dump([b.to_dict() for b in bots], f, indent=2)
-        except Exception as e:
-            logger.error(f"Erro ao salvar status do bot: {e}")
+        self._save_bot_active_flag(bot_id, True)
         
         logger.info(f"Bot {bot_id} iniciado")
         return True
     
     def stop_bot(self, bot_id):
-        """Para um bot específico"""
-        if bot_id not in self.threads or not self.threads[bot_id].is_alive():
+        """Para um bot específico cancelando sua tarefa"""
+        if not self.is_bot_running(bot_id):
             logger.warning(f"Bot {bot_id} não está em execução")
             return False
         
-        # Remover o bot da lista de ativos para que o loop termine
-        if bot_id in self.active_bots:
-            del self.active_bots[bot_id]
-        
-        # Aguardar a thread terminar
-        self.threads[bot_id].join(timeout=5)
-        del self.threads[bot_id]
+        # Cancelar a tarefa e aguardar o encerramento
+        self._call_in_loop(self._cancel_bot(bot_id), timeout=STOP_TIMEOUT_SECONDS + 1)
         
         # Atualizar status do bot
-        bots = self.load_bots()
-        for i, b in enumerate(bots):
-            if b.id == bot_id:
-                bots[i].is_active = False
-                bots[i].updated_at = datetime.now()
-                break
-        
-        try:
-            with open(self.bots_file, 'w') as f:
-                json.dump([b.to_dict() for b in bots], f, indent=2)
-        except Exception as e:
-            logger.error(f"Erro ao salvar status do bot: {e}")
+        self._save_bot_active_flag(bot_id, False)
         
         logger.info(f"Bot {bot_id} parado")
         return True
     
+    def resume_active_bots(self):
+        """Retoma, após um reinício, os bots marcados como ativos no arquivo de bots"""
+        bots = self.load_bots()
+        
+        # Descartar o estado de publicações que não existem mais
+        post_ids = {post.id for post in self.load_posts()}
+        for state in (self.last_sent, self.next_due):
+            for post_id in list(state.keys()):
+                if post_id not in post_ids:
+                    del state[post_id]
+        self.changes.touch()
+        self._save_schedule_state()
+        
+        resumed = 0
+        for bot in bots:
+            if bot.is_active and not self.is_bot_running(bot.id):
+                if self.start_bot(bot.id):
+                    resumed += 1
+        
+        logger.info(f"{resumed} bots ativos retomados")
+        return resumed
+    
     def start_all_bots(self):
         """Inicia todos os bots cadastrados"""
         bots = self.load_bots()
@@ -406,34 +833,89 @@ class TelegramBotService:
     
     def stop_all_bots(self):
         """Para todos os bots em execução"""
-        bot_ids = list(self.threads.keys())
+        bot_ids = list(self.tasks.keys())
         success_count = 0
         
         for bot_id in bot_ids:
             if self.stop_bot(bot_id):
                 success_count += 1
         
+        # Gravar os resultados de envio que ainda estavam na fila ou em memória
+        self.writer.drain()
+        self.storage.flush()
         return success_count
     
-    def _run_async_loop_for_bot(self, bot_id, bot_token):
-        """Executa o loop assíncrono para um bot específico em uma thread"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(self.run_bot(bot_id, bot_token))
-        finally:
-            loop.close()
+    async def _drain(self, timeout):
+        """Aguarda os envios e reenvios em andamento terminarem, até `timeout` segundos"""
+        pending = [task for sends in self.sends.values() for task in sends.values()]
+        pending += [task for retries in self.retry_queues.values() for task in retries.tasks]
+        if pending:
+            logger.info(f"Aguardando {len(pending)} envios em andamento")
+            await asyncio.wait(pending, timeout=timeout)
     
-    def status(self):
-        """Retorna o status atual dos bots"""
-        bots = self.load_bots()
-        posts = self.load_posts()
-        
-        return {
-            "active_bots": [b.id for b in bots if b.is_active],
-            "total_bots": len(bots),
-            "total_posts": len(posts),
-            "running_threads": list(self.threads.keys()),
+    def shutdown(self, drain_timeout=DRAIN_TIMEOUT_SECONDS):
+        """Encerra todos os bots sem alterar o campo is_active, para que sejam retomados no próximo início.
+        
+        Nenhum envio novo é iniciado; os que estão em andamento têm até
+        `drain_timeout` segundos para terminar antes de serem cancelados.
+        """
+        self.draining = True
+        if self.tasks:
+            try:
+                self._call_in_loop(self._drain(drain_timeout), timeout=drain_timeout + 1)
+            except Exception as e:
+                logger.error(f"Erro ao aguardar os envios em andamento: {e}")
+        for bot_id in list(self.tasks.keys()):
+            try:
+                self._call_in_loop(self._cancel_bot(bot_id), timeout=STOP_TIMEOUT_SECONDS + 1)
+            except Exception as e:
+                logger.error(f"Erro ao encerrar o bot {bot_id}: {e}")
+        self._save_schedule_state()
+        self.writer.drain()
+        self.storage.flush()
+    
+    def refresh_changes(self):
+        """Incorpora à versão do estado as alterações feitas por outros processos"""
+        self.storage.posts.refresh()
+        self.storage.bots.refresh()
+        return self.changes.token
+    
+    def status(self, since=None):
+        """Retorna o status atual dos bots.
+        
+        Com `since` (uma `version` retornada antes), os horários e tarefas
+        trazem apenas as publicações e bots alterados desde então, listados em
+        `changed_posts` e `changed_bots`; ids listados sem entrada nos mapas
+        foram removidos. Se o histórico de alterações não cobrir `since`, a
+        resposta é completa (`delta` falso).
+        """
+        version = self.refresh_changes()
+        changed = self.changes.changes_since(since) if since is not None else None
+        
+        last_sent = dict(self.last_sent)
+        next_due = dict(self.next_due)
+        tasks = dict(self.task_states)
+        if changed is not None:
+            post_ids = {key[1] for key in changed if key[0] == 'post'}
+            bot_ids = {key[1] for key in changed if key[0] == 'bot'}
+            last_sent = {post_id: last_sent[post_id] for post_id in post_ids if post_id in last_sent}
+            next_due = {post_id: next_due[post_id] for post_id in post_ids if post_id in next_due}
+            tasks = {bot_id: tasks[bot_id] for bot_id in bot_ids if bot_id in tasks}
+        
+        result = {
+            "version": version,
+            "delta": changed is not None,
+            "active_bots": [b.id for b in self.storage.bots.find_by('is_active', True)],
+            "total_bots": self.storage.bots.count(),
+            "total_posts": self.storage.posts.count(),
+            "running_bots": [bot_id for bot_id in list(self.tasks.keys()) if self.is_bot_running(bot_id)],
+            "tasks": tasks,
             "last_sent": {post_id: datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') 
-                         for post_id, timestamp in self.last_sent.items()}
+                         for post_id, timestamp in last_sent.items()},
+            "next_due": {post_id: datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                         for post_id, timestamp in next_due.items()}
         }
+        if changed is not None:
+            result["changed_posts"] = sorted(post_ids)
+            result["changed_bots"] = sorted(bot_ids)
+        return result
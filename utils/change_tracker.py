@@ -0,0 +1,59 @@
+import threading
+import uuid
+from collections import deque
+
+# Quantas alterações recentes são lembradas para as consultas incrementais
+CHANGE_JOURNAL_SIZE = 5000
+
+
+class ChangeTracker:
+    """Versão monotônica do estado, com um diário limitado das chaves alteradas.
+
+    Cada alteração incrementa `version`. Alterações com chave (ex.:
+    ('post', id)) entram no diário e permitem responder "o que mudou desde
+    a versão N"; alterações sem chave (ex.: o arquivo foi substituído por
+    outro processo) invalidam as consultas anteriores a elas.
+
+    O contador recomeça a cada processo, por isso a versão entregue aos
+    clientes (`token`) leva também uma época aleatória: um token de antes
+    de um reinício nunca coincide com o de agora.
+    """
+
+    def __init__(self, journal_size=CHANGE_JOURNAL_SIZE):
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:12]  # identifica esta instância do processo
+        self.version = 0
+        self.journal = deque(maxlen=journal_size)  # (versão, chave)
+        self.horizon = 0  # consultas anteriores a esta versão exigem o estado completo
+
+    def touch(self, key=None):
+        """Registra uma alteração e retorna a nova versão"""
+        with self.lock:
+            self.version += 1
+            if key is None:
+                self.horizon = self.version
+            else:
+                if len(self.journal) == self.journal.maxlen:
+                    self.horizon = max(self.horizon, self.journal[0][0])
+                self.journal.append((self.version, key))
+            return self.version
+
+    @property
+    def token(self):
+        """Versão atual no formato entregue aos clientes: '<época>-<versão>'"""
+        return f"{self.epoch}-{self.version}"
+
+    def changes_since(self, since):
+        """Chaves alteradas depois do token `since`, ou None se for preciso o estado completo.
+
+        Tokens de outra época (de antes de um reinício) ou inválidos exigem o
+        estado completo.
+        """
+        epoch, _, number = str(since).rpartition('-')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        since = int(number)
+        with self.lock:
+            if since > self.version or since < self.horizon:
+                return None
+            return {key for version, key in self.journal if version > since}
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from src.storage.files import atomic_write_json
+from src.utils.file_upload import (
+    UPLOAD_FOLDER, UPLOAD_CHUNK_SIZE, MAX_CONTENT_LENGTH, allowed_file, store_file
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+# Uploads em andamento: arquivo parcial (<id>.part), estado (<id>.json) e as
+# partes ainda em verificação (<id>.<aleatório>.chunk)
+PARTIAL_FOLDER = os.path.join(UPLOAD_FOLDER, '.partial')
+
+# Tamanho máximo de cada parte enviada com PUT
+MAX_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+
+# Uploads sem atividade por mais tempo que isto são descartados (segundos)
+UPLOAD_EXPIRY_SECONDS = 24 * 60 * 60
+
+
+class UploadError(Exception):
+    """Requisição de upload em partes recusada; `status` é o código HTTP da resposta"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _paths(upload_id):
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload não encontrado', 404)
+    base = os.path.join(PARTIAL_FOLDER, upload_id)
+    return f"{base}.part", f"{base}.json", f"{base}.lock"
+
+
+@contextmanager
+def _locked(upload_id):
+    """Serializa as alterações de um upload entre threads e processos"""
+    _, _, lock_path = _paths(upload_id)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_state(upload_id):
+    _, state_path, _ = _paths(upload_id)
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError('Upload não encontrado', 404)
+
+
+def _received_bytes(ranges):
+    return sum(end - start for start, end in ranges)
+
+
+def _add_range(ranges, start, end):
+    """Inclui [start, end) na lista ordenada de intervalos recebidos, unindo os vizinhos"""
+    merged = []
+    for current in sorted(ranges + [[start, end]]):
+        if merged and current[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], current[1])
+        else:
+            merged.append(list(current))
+    return merged
+
+
+def _next_missing(ranges):
+    """Primeiro byte ainda não recebido"""
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+
+def describe(state):
+    """Resumo do upload para o cliente retomar o envio"""
+    return {
+        'upload_id': state['id'],
+        'filename': state['filename'],
+        'size': state['size'],
+        'received': _received_bytes(state['ranges']),
+        'ranges': state['ranges'],
+        'next_offset': _next_missing(state['ranges']),
+        'max_chunk_size': MAX_CHUNK_SIZE
+    }
+
+
+def check_owner(state, user_id, is_admin):
+    if not is_admin and state['user_id'] != user_id:
+        raise UploadError('Permissão negada', 403)
+
+
+def cleanup_expired_uploads(now=None):
+    """Remove os uploads abandonados há mais de UPLOAD_EXPIRY_SECONDS"""
+    now = now or time.time()
+    try:
+        names = os.listdir(PARTIAL_FOLDER)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(PARTIAL_FOLDER, name)
+        try:
+            if now - os.path.getmtime(path) > UPLOAD_EXPIRY_SECONDS:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def create_upload(filename, size, user_id, sha256=None):
+    """Inicia um upload em partes, reservando no disco o tamanho total do arquivo"""
+    if not filename or not allowed_file(filename):
+        raise UploadError('Tipo de arquivo não permitido')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("Informe o tamanho do arquivo em 'size'")
+    if size > MAX_CONTENT_LENGTH:
+        raise UploadError(f'Arquivo maior que o limite de {MAX_CONTENT_LENGTH // (1024 * 1024)}MB', 413)
+
+    os.makedirs(PARTIAL_FOLDER, exist_ok=True)
+    cleanup_expired_uploads()
+
+    upload_id = uuid.uuid4().hex
+    part_path, state_path, _ = _paths(upload_id)
+    with open(part_path, 'wb') as f:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        else:
+            f.truncate(size)
+
+    state = {
+        'id': upload_id,
+        'filename': filename,
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'user_id': user_id,
+        'created_at': time.time(),
+        'ranges': []  # intervalos [início, fim) já recebidos e verificados
+    }
+    atomic_write_json(state_path, state)
+    return state
+
+
+def get_upload(upload_id):
+    return _load_state(upload_id)
+
+
+def write_chunk(upload_id, offset, stream, length, checksum):
+    """Grava uma parte no arquivo reservado, na posição `offset`.
+
+    A parte é lida do stream em blocos para um arquivo temporário e só é
+    copiada para o arquivo reservado (e registrada como recebida) se o
+    SHA-256 conferir com `checksum`; caso contrário o cliente deve reenviá-la.
+    Assim, uma retransmissão corrompida nunca sobrescreve bytes já verificados.
+    """
+    if offset is None or offset < 0:
+        raise UploadError("Informe a posição da parte em 'offset'")
+    if length is None or length <= 0:
+        raise UploadError('Parte vazia ou sem Content-Length', 411)
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f'Parte maior que o limite de {MAX_CHUNK_SIZE // (1024 * 1024)}MB', 413)
+    if not checksum:
+        raise UploadError('Informe o SHA-256 da parte no cabeçalho X-Chunk-SHA256')
+
+    state = _load_state(upload_id)
+    if offset + length > state['size']:
+        raise UploadError('A parte ultrapassa o tamanho declarado do arquivo', 416)
+
+    part_path, state_path, _ = _paths(upload_id)
+    # Partes recebidas em paralelo usam temporários distintos; removido ao final em qualquer caso
+    chunk_path = os.path.join(PARTIAL_FOLDER, f"{upload_id}.{uuid.uuid4().hex}.chunk")
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(chunk_path, 'wb') as f:
+            while written < length:
+                block = stream.read(min(UPLOAD_CHUNK_SIZE, length - written))
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                written += len(block)
+
+        if written != length:
+            raise UploadError('Parte incompleta: a conexão foi interrompida', 400)
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError('O SHA-256 da parte não confere; envie-a novamente', 422)
+
+        with _locked(upload_id):
+            state = _load_state(upload_id)
+            try:
+                with open(chunk_path, 'rb') as source, open(part_path, 'r+b') as target:
+                    target.seek(offset)
+                    while True:
+                        block = source.read(UPLOAD_CHUNK_SIZE)
+                        if not block:
+                            break
+                        target.write(block)
+            except FileNotFoundError:
+                # Descartado enquanto a parte era recebida
+                raise UploadError('Upload não encontrado', 404)
+            state['ranges'] = _add_range(state['ranges'], offset, offset + length)
+            atomic_write_json(state_path, state)
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+    return state
+
+
+def finalize_upload(upload_id):
+    """Conclui o upload: confere se todas as partes chegaram e guarda o arquivo pelo conteúdo"""
+    with _locked(upload_id):
+        state = _load_state(upload_id)
+        if state['ranges'] != [[0, state['size']]]:
+            raise UploadError('Ainda faltam partes do arquivo', 409)
+
+        part_path, state_path, lock_path = _paths(upload_id)
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            while True:
+                block = f.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        digest = digest.hexdigest()
+        if state['sha256'] and digest != state['sha256']:
+            abort_upload(upload_id)
+            raise UploadError('O SHA-256 do arquivo não confere com o informado ao iniciar', 422)
+
+        result = store_file(part_path, digest, state['filename'], state['size'], library=True)
+        os.remove(state_path)
+    os.remove(lock_path)
+    return result
+
+
+def abort_upload(upload_id):
+    """Descarta um upload em andamento"""
+    removed = False
+    for path in _paths(upload_id):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
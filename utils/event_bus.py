@@ -0,0 +1,145 @@
+import itertools
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+# Eventos recentes guardados para os clientes que reconectam (Last-Event-ID)
+EVENT_REPLAY_SIZE = 500
+
+# Eventos pendentes por assinante antes de ele ser considerado lento
+SUBSCRIBER_QUEUE_SIZE = 200
+
+# Evento enviado ao assinante que perdeu eventos e precisa recarregar o estado
+RESET_EVENT = 'reset'
+
+
+class Event:
+    """Evento publicado; o `id` de um `reset` é o do último evento publicado até ele"""
+
+    __slots__ = ('id', 'type', 'data', 'ts', 'seq')
+
+    def __init__(self, event_id, event_type, data, seq=None):
+        self.id = event_id  # '<época>-<seq>', enviado aos clientes
+        self.type = event_type
+        self.data = data
+        self.ts = time.time()
+        self.seq = seq  # posição do evento no barramento que o publicou
+
+
+class Subscription:
+    """Fila limitada de eventos de um assinante"""
+
+    def __init__(self, bus, size):
+        self.bus = bus
+        self.queue = queue.Queue(maxsize=size)
+
+    def _offer(self, event):
+        """Entrega sem bloquear; retorna False se a fila estiver cheia"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout=None):
+        """Próximo evento, ou None se nada chegar dentro de `timeout`"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Pub/sub em memória, com filas limitadas e buffer de reenvio.
+
+    `publish` nunca bloqueia quem publica (o event loop dos bots): um
+    assinante cuja fila enche é desligado e recebe um evento `reset`, e o
+    cliente deve recarregar o estado e reconectar. Os últimos eventos ficam
+    em um buffer, de onde um cliente que reconecta recebe o que perdeu a
+    partir do último ID visto.
+
+    A numeração recomeça a cada processo, por isso os IDs levam uma época
+    aleatória ('<época>-<n>'): um ID de antes de um reinício nunca é
+    confundido com um evento deste processo.
+    """
+
+    def __init__(self, replay_size=EVENT_REPLAY_SIZE, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:12]  # identifica esta instância do processo
+        self.ids = itertools.count(1)
+        self.replay = deque(maxlen=replay_size)
+        self.queue_size = queue_size
+        self.subscribers = set()
+
+    def _event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def _parse_id(self, event_id):
+        """Posição de um ID deste barramento, ou None se for de outra época ou inválido"""
+        epoch, _, number = str(event_id).rpartition('-')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def publish(self, event_type, data):
+        with self.lock:
+            seq = next(self.ids)
+            event = Event(self._event_id(seq), event_type, data, seq)
+            self.replay.append(event)
+            lagging = [sub for sub in self.subscribers if not sub._offer(event)]
+            for sub in lagging:
+                self._drop(sub)
+        return event
+
+    def _drop(self, sub):
+        """Desliga um assinante lento, avisando-o de que perdeu eventos"""
+        self.subscribers.discard(sub)
+        # Abrir espaço para o aviso, que é sempre o último evento da fila
+        try:
+            sub.queue.get_nowait()
+        except queue.Empty:
+            pass
+        newest = self.replay[-1]
+        sub._offer(Event(newest.id, RESET_EVENT, {'reason': 'overflow'}, newest.seq))
+
+    def subscribe(self, last_event_id=None):
+        """Cria um assinante; com `last_event_id`, recebe antes os eventos perdidos desde ele.
+
+        Se o buffer não cobre mais esses eventos, ou o ID é de outra época (de
+        antes de o serviço reiniciar), o assinante recebe apenas o `reset`.
+        """
+        sub = Subscription(self, self.queue_size)
+        with self.lock:
+            if last_event_id is not None:
+                oldest = self.replay[0].seq if self.replay else 1
+                newest = self.replay[-1].seq if self.replay else 0
+                last_seq = self._parse_id(last_event_id)
+                missed = [event for event in self.replay if last_seq is not None and event.seq > last_seq]
+                if (last_seq is None or last_seq < oldest - 1 or last_seq > newest
+                        or len(missed) >= self.queue_size):
+                    sub._offer(Event(self._event_id(newest), RESET_EVENT, {'reason': 'expired'}, newest))
+                    return sub
+                for event in missed:
+                    sub._offer(event)
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+
+def format_sse(event):
+    """Serializa o evento no formato text/event-stream"""
+    lines = []
+    if event.id is not None:
+        lines.append(f"id: {event.id}")
+    lines.append(f"event: {event.type}")
+    lines.append(f"data: {json.dumps(event.data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
@@ -1,12 +1,21 @@
+import hashlib
 import os
 import uuid
 from werkzeug.utils import secure_filename
+from src.storage import get_storage
+from src.utils.media_cache import get_file_id_cache
 
 # Configurações para upload de arquivos
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'avi', 'mov', 'webm'}
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
 
+# Tamanho dos blocos copiados do upload para o disco enquanto o hash é calculado
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Cache dos file_id do Telegram, compartilhado com o serviço do bot
+FILE_ID_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'file_ids.json')
+
 # Garantir que o diretório de uploads exista
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -24,36 +33,127 @@ def get_file_type(filename):
         return 'video'
     return None
 
-def save_uploaded_file(file):
-    """Salva um arquivo enviado e retorna o caminho relativo"""
+def find_stored_file(digest):
+    """Nome do arquivo já guardado com o conteúdo de hash `digest`, se houver"""
+    for ext in ALLOWED_EXTENSIONS:
+        filename = f"{digest}.{ext}"
+        if os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
+            return filename
+    return None
+
+def store_file(temp_path, digest, filename, size, library=False):
+    """Guarda pelo hash um arquivo já gravado em `temp_path` (que é consumido).
+    
+    Se o mesmo conteúdo já estiver guardado, o temporário é descartado e o
+    arquivo existente é reutilizado. Assim, a mesma mídia enviada para
+    várias publicações ocupa o disco uma única vez e tem o mesmo caminho,
+    o que também permite reaproveitar o file_id do Telegram. Com `library`
+    (envios para a biblioteca), o arquivo é marcado no índice como da
+    biblioteca, inclusive quando já existia; ver `release_media`.
+    """
+    ext = filename.rsplit('.', 1)[1].lower()
+    try:
+        stored = find_stored_file(digest)
+        duplicate = stored is not None
+        if not duplicate:
+            stored = f"{digest}.{ext}"
+            try:
+                # link não sobrescreve: dois envios simultâneos do mesmo conteúdo ficam com um arquivo
+                os.link(temp_path, os.path.join(UPLOAD_FOLDER, stored))
+            except FileExistsError:
+                duplicate = True
+            except OSError:
+                # Sistema de arquivos sem hard links
+                os.replace(temp_path, os.path.join(UPLOAD_FOLDER, stored))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    if not duplicate or library:
+        # Importado aqui: o índice da biblioteca depende deste módulo
+        from src.utils.media_library import index_file
+        index_file(stored, secure_filename(filename), digest, library)
+    
+    return {
+        'success': True,
+        'file_path': os.path.join('static', 'uploads', stored),
+        'file_type': get_file_type(stored),
+        'original_name': secure_filename(filename),
+        'sha256': digest,
+        'size': size,
+        'duplicate': duplicate
+    }
+
+def store_stream(stream, filename, library=False):
+    """Grava o conteúdo de `stream` pelo hash SHA-256 (ver `store_file`), lendo em blocos.
+    
+    O hash é calculado durante a cópia para um arquivo temporário, sem
+    carregar o arquivo inteiro em memória.
+    """
+    temp_path = os.path.join(UPLOAD_FOLDER, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as f:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_CONTENT_LENGTH:
+                    os.remove(temp_path)
+                    return {
+                        'success': False,
+                        'error': f'Arquivo maior que o limite de {MAX_CONTENT_LENGTH // (1024 * 1024)}MB'
+                    }
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return store_file(temp_path, digest.hexdigest(), filename, size, library)
+
+def save_uploaded_file(file, library=False):
+    """Salva um arquivo enviado, endereçado pelo conteúdo, e retorna o caminho relativo"""
     if file and allowed_file(file.filename):
-        # Gerar um nome de arquivo seguro e único
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        # Caminho completo para salvar o arquivo
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        
-        # Salvar o arquivo
-        file.save(file_path)
-        
-        # Retornar o caminho relativo para armazenar no banco de dados
-        relative_path = os.path.join('static', 'uploads', unique_filename)
-        
-        return {
-            'success': True,
-            'file_path': relative_path,
-            'file_type': get_file_type(filename),
-            'original_name': filename
-        }
+        return store_stream(file.stream, file.filename, library)
     
     return {
         'success': False,
         'error': 'Tipo de arquivo não permitido'
     }
 
+def media_references(media_url):
+    """Número de publicações que usam a mídia"""
+    return get_storage().posts.count_by('media_url', media_url)
+
+def release_media(media_url):
+    """Libera a mídia que uma publicação deixou de usar.
+    
+    Arquivos locais são excluídos (e seus file_id descartados) apenas quando
+    nenhuma outra publicação os referencia, pois o mesmo conteúdo é
+    compartilhado entre publicações, e não pertencem à biblioteca de mídia.
+    """
+    if not media_url or media_references(media_url) > 0:
+        return False
+    if media_url.startswith(('http://', 'https://')):
+        invalidate_media_cache(media_url)
+        return False
+    entry = get_storage().media.get(os.path.basename(media_url))
+    if entry is not None and entry.library:
+        return False
+    return delete_file(media_url)
+
+def invalidate_media_cache(media_url):
+    """Descarta os file_id do Telegram associados a uma mídia"""
+    if media_url:
+        get_file_id_cache(FILE_ID_CACHE_FILE).invalidate(media_url)
+
 def delete_file(file_path):
     """Deleta um arquivo do sistema de arquivos"""
+    invalidate_media_cache(file_path)
     try:
         # Verificar se o caminho é relativo e convertê-lo para absoluto
         if not os.path.isabs(file_path):
@@ -64,32 +164,11 @@ def delete_file(file_path):
         # Verificar se o arquivo existe
         if os.path.exists(absolute_path):
             os.remove(absolute_path)
+            if os.path.dirname(os.path.abspath(absolute_path)) == os.path.abspath(UPLOAD_FOLDER):
+                from src.utils.media_library import unindex_file
+                unindex_file(os.path.basename(absolute_path))
             return True
         return False
     except Exception as e:
         print(f"Erro ao deletar arquivo: {e}")
         return False
-
-def get_media_list():
-    """Retorna uma lista de todos os arquivos de mídia disponíveis"""
-    try:
-        files = []
-        for filename in os.listdir(UPLOAD_FOLDER):
-            file_path = os.path.join('static', 'uploads', filename)
-            file_type = get_file_type(filename) if '.' in filename else None
-            
-            if file_type:
-                files.append({
-                    'name': filename,
-                    'path': file_path,
-                    'type': file_type,
-                    'size': os.path.getsize(os.path.join(UPLOAD_FOLDER, filename)) // 1024  # tamanho em KB
-                })
-        
-        # Ordenar por data de modificação (mais recentes primeiro)
-        files.sort(key=lambda x: os.path.getmtime(os.path.join(UPLOAD_FOLDER, x['name'])), reverse=True)
-        
-        return files
-    except Exception as e:
-        print(f"Erro ao listar arquivos de mídia: {e}")
-        return []
@@ -0,0 +1,17 @@
+from flask import current_app, jsonify, request
+
+
+def conditional_json(etag, build_payload):
+    """Resposta JSON com ETag; retorna 304 sem montar o corpo se o cliente já tem essa versão.
+
+    `build_payload` só é chamado quando a versão do cliente (If-None-Match)
+    difere de `etag`. `no-cache` obriga o navegador a revalidar a cada
+    consulta em vez de reutilizar uma resposta antiga.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
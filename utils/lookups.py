@@ -0,0 +1,72 @@
+import threading
+from flask import g, has_request_context
+from src.storage import get_storage
+
+
+class CachedLookup:
+    """Consulta por ID memoizada entre requisições.
+
+    Os valores ficam em memória até o repositório avisar (`subscribe`) que o
+    registro mudou. Alterações feitas por outros processos são incorporadas
+    com um `refresh` do repositório, feito uma única vez por requisição: uma
+    página que consulta o mesmo bot para cada publicação custa uma
+    verificação do arquivo, não uma leitura por chamada.
+
+    `project` extrai do registro o valor guardado (ex.: o nome do bot); os
+    registros guardados inteiros são compartilhados e não devem ser alterados.
+    """
+
+    def __init__(self, repo, project=None):
+        self.repo = repo
+        self.project = project
+        self.lock = threading.Lock()
+        self.values = {}
+        self.generation = 0  # muda a cada invalidação, para descartar leituras concorrentes
+        repo.subscribe(self._invalidate)
+
+    def _invalidate(self, item_id):
+        with self.lock:
+            self.generation += 1
+            if item_id is None:
+                self.values.clear()
+            else:
+                self.values.pop(item_id, None)
+
+    def _refresh(self):
+        if not has_request_context():
+            self.repo.refresh()
+            return
+        refreshed = g.setdefault('_refreshed_repositories', set())
+        if id(self.repo) not in refreshed:
+            refreshed.add(id(self.repo))
+            self.repo.refresh()
+
+    def get(self, item_id):
+        """Valor do registro com o ID informado, ou None se ele não existir"""
+        if not item_id:
+            return None
+        self._refresh()
+        with self.lock:
+            if item_id in self.values:
+                return self.values[item_id]
+            generation = self.generation
+
+        item = self.repo.get(item_id)
+        value = self.project(item) if item is not None and self.project else item
+
+        with self.lock:
+            if generation == self.generation:
+                self.values[item_id] = value
+        return value
+
+
+bot_names = CachedLookup(get_storage().bots, lambda bot: bot.name)
+users = CachedLookup(get_storage().users)
+
+
+def get_bot_name(bot_id):
+    return bot_names.get(bot_id)
+
+
+def get_user(user_id):
+    return users.get(user_id)
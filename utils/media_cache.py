@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from src.storage.files import atomic_write_json
+
+# Instâncias compartilhadas por caminho de arquivo dentro do processo
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def normalize_media_key(media_url):
+    """Normaliza o caminho da mídia para uso como chave do cache"""
+    if not media_url:
+        return media_url
+    if media_url.startswith(('http://', 'https://')):
+        return media_url
+    return os.path.normpath(media_url)
+
+
+class FileIdCache:
+    """Cache persistente dos file_id do Telegram por mídia e por bot.
+
+    O arquivo tem o formato {media_url: {bot_id: file_id}}. Outros processos
+    podem alterá-lo; a cópia em memória é recarregada quando o mtime muda.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.mtime = None
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.entries, self.mtime = {}, None
+            return
+
+        if mtime == self.mtime:
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.mtime = mtime
+
+    def _save(self):
+        atomic_write_json(self.path, self.entries)
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, bot_id, media_url):
+        """Retorna o file_id conhecido para a mídia neste bot ou None"""
+        with self.lock:
+            self._reload_if_changed()
+            return self.entries.get(normalize_media_key(media_url), {}).get(bot_id)
+
+    def put(self, bot_id, media_url, file_id):
+        """Registra o file_id obtido no primeiro envio da mídia pelo bot"""
+        key = normalize_media_key(media_url)
+        with self.lock:
+            self._reload_if_changed()
+            if self.entries.get(key, {}).get(bot_id) == file_id:
+                return
+            self.entries.setdefault(key, {})[bot_id] = file_id
+            self._save()
+
+    def invalidate(self, media_url, bot_id=None):
+        """Descarta os file_id de uma mídia (de todos os bots ou de um só)"""
+        key = normalize_media_key(media_url)
+        with self.lock:
+            self._reload_if_changed()
+            if key not in self.entries:
+                return False
+            if bot_id is None:
+                del self.entries[key]
+            elif self.entries[key].pop(bot_id, None) is None:
+                return False
+            elif not self.entries[key]:
+                del self.entries[key]
+            self._save()
+            return True
+
+
+def get_file_id_cache(path):
+    """Retorna a instância do cache associada ao arquivo informado"""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = FileIdCache(path)
+        return cache
@@ -0,0 +1,185 @@
+import logging
+import os
+import re
+import struct
+from src.models.media import MediaFile
+from src.storage import get_storage
+from src.utils.file_upload import UPLOAD_FOLDER, get_file_type, media_references
+from src.utils.pagination import paginate, parse_page_size
+from src.utils.thumbnails import delete_thumbnail, schedule_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Arquivos guardados pelo conteúdo: <sha256>.<extensão>
+HASHED_NAME_PATTERN = re.compile(r'^([0-9a-f]{64})\.\w+$')
+
+# Ordenações aceitas na biblioteca: {nome: função que extrai a chave}
+MEDIA_SORT_KEYS = {
+    'mtime': lambda entry: entry.mtime or 0,
+    'size': lambda entry: entry.size or 0,
+    'name': lambda entry: (entry.original_name or entry.id).lower(),
+}
+
+# Marcadores JPEG de início de quadro, que trazem as dimensões da imagem
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def media_index():
+    return get_storage().media
+
+
+def media_type(filename):
+    """Tipo da mídia pela extensão, ou None para arquivos que não fazem parte da biblioteca"""
+    if filename.startswith('.') or '.' not in filename:
+        return None
+    return get_file_type(filename)
+
+
+def read_image_size(path):
+    """(largura, altura) lidas do cabeçalho de um PNG, GIF ou JPEG, sem decodificar a imagem"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+            if head.startswith(b'\x89PNG\r\n\x1a\n'):
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if not head.startswith(b'\xff\xd8'):
+                return None
+            # Percorrer os segmentos do JPEG até o início do quadro
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code == 0xFF:
+                    f.seek(-1, os.SEEK_CUR)  # preenchimento entre segmentos
+                    continue
+                if code == 0x01 or 0xD0 <= code <= 0xD9:
+                    continue  # marcadores sem conteúdo
+                length = struct.unpack('>H', f.read(2))[0]
+                if code in JPEG_SOF_MARKERS:
+                    height, width = struct.unpack('>HH', f.read(5)[1:5])
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def describe_file(filename, stat, previous=None, original_name=None, sha256=None, library=False):
+    """Entrada do índice para um arquivo da pasta de uploads; `library` nunca é desmarcado"""
+    file_type = media_type(filename)
+    width = height = None
+    if previous is not None and previous.size == stat.st_size:
+        width, height = previous.width, previous.height
+    elif file_type == 'photo':
+        width, height = read_image_size(os.path.join(UPLOAD_FOLDER, filename)) or (None, None)
+    hashed = HASHED_NAME_PATTERN.match(filename)
+    return MediaFile(
+        id=filename,
+        type=file_type,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        width=width,
+        height=height,
+        original_name=original_name or (previous.original_name if previous is not None else None),
+        sha256=sha256 or (hashed.group(1) if hashed else None),
+        library=library or (previous.library if previous is not None else False)
+    )
+
+
+def index_file(filename, original_name=None, sha256=None, library=False):
+    """Inclui ou atualiza no índice um arquivo recém-gravado na pasta de uploads.
+    
+    Com `library`, o arquivo passa a pertencer à biblioteca e só sai dela
+    pela exclusão explícita, mesmo que as publicações que o usam sejam removidas.
+    """
+    if not media_type(filename):
+        return None
+    try:
+        stat = os.stat(os.path.join(UPLOAD_FOLDER, filename))
+    except FileNotFoundError:
+        return None
+    repo = media_index()
+    entry = describe_file(filename, stat, repo.get(filename), original_name, sha256, library)
+    repo.upsert(entry)
+    schedule_thumbnail(filename, entry.type)
+    return entry
+
+
+def unindex_file(filename):
+    """Remove do índice (e descarta a miniatura de) um arquivo excluído da pasta de uploads"""
+    delete_thumbnail(filename)
+    return media_index().delete(filename)
+
+
+def reconcile_media_index():
+    """Sincroniza o índice com a pasta de uploads (arquivos copiados ou apagados à mão).
+
+    Custa uma listagem da pasta: só os arquivos novos ou com tamanho ou data
+    alterados são lidos, e todas as diferenças são gravadas de uma vez.
+    Arquivos que não passaram pelo upload da aplicação entram como da
+    biblioteca, para nunca serem excluídos junto com uma publicação.
+    Retorna (incluídos ou atualizados, removidos).
+    """
+    repo = media_index()
+    indexed = {entry.id: entry for entry in repo.all()}
+    operations, seen = [], set()
+    try:
+        with os.scandir(UPLOAD_FOLDER) as entries:
+            for dir_entry in entries:
+                if not media_type(dir_entry.name) or not dir_entry.is_file():
+                    continue
+                seen.add(dir_entry.name)
+                stat = dir_entry.stat()
+                previous = indexed.get(dir_entry.name)
+                if previous is not None and previous.size == stat.st_size and previous.mtime == stat.st_mtime:
+                    continue
+                operations.append(('upsert', describe_file(dir_entry.name, stat, previous, library=previous is None)))
+    except OSError as e:
+        logger.error(f"Erro ao listar a pasta de uploads: {e}")
+        return 0, 0
+
+    updated = len(operations)
+    operations.extend(('delete', filename) for filename in indexed.keys() - seen)
+    if operations and repo.apply_batch(operations) is None:
+        return 0, 0
+    for action, target in operations:
+        if action == 'upsert':
+            schedule_thumbnail(target.id, target.type)
+        else:
+            delete_thumbnail(target)
+    if operations:
+        logger.info(f"Índice de mídia sincronizado: {updated} arquivos atualizados, {len(operations) - updated} removidos")
+    return updated, len(operations) - updated
+
+
+def query_media(args):
+    """Página da biblioteca de mídia, conforme os filtros da query string.
+
+    Filtros: `type` (photo/video), `used` (true/false: referenciada ou não
+    por alguma publicação) e `q` (trecho do nome). Ordenação por `sort`
+    (um dos MEDIA_SORT_KEYS, com prefixo '-' para decrescente; padrão: mais
+    recentes primeiro) e paginação por `cursor` e `limit`. Retorna (página,
+    próximo cursor, total filtrado).
+    """
+    file_type = args.get('type') or None
+    entries = media_index().find_by('type', file_type) if file_type else media_index().all()
+
+    search = (args.get('q') or '').strip().lower()
+    if search:
+        entries = [entry for entry in entries
+                   if search in entry.id or search in (entry.original_name or '').lower()]
+
+    used = (args.get('used') or '').lower()
+    if used in ('true', 'false'):
+        entries = [entry for entry in entries if (media_references(entry.path) > 0) == (used == 'true')]
+
+    sort = args.get('sort') or '-mtime'
+    descending = sort.startswith('-')
+    sort_key = MEDIA_SORT_KEYS.get(sort.lstrip('-'), MEDIA_SORT_KEYS['mtime'])
+
+    page, next_cursor = paginate(entries, sort_key, cursor=args.get('cursor'),
+                                 limit=parse_page_size(args.get('limit')), descending=descending)
+    return page, next_cursor, len(entries)
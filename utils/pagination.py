@@ -0,0 +1,59 @@
+import base64
+import json
+
+# Tamanho padrão e máximo das páginas de listagem
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value, item_id):
+    """Cursor opaco apontando para o último item de uma página"""
+    raw = json.dumps([sort_value, item_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica o cursor; retorna None se ele for inválido"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, item_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return (sort_value, item_id)
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(items, sort_key, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """Página de `items` ordenada por (sort_key(item), item.id), a partir do cursor.
+
+    Usa paginação por chave (keyset): o cursor guarda a chave do último item
+    entregue, de modo que inclusões e exclusões entre uma página e outra não
+    repetem nem pulam itens. Retorna (página, próximo cursor ou None).
+    """
+    keyed = sorted(((sort_key(item), item.id or '', item) for item in items),
+                   key=lambda entry: entry[:2], reverse=descending)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        position = tuple(position)
+        try:
+            if descending:
+                keyed = [entry for entry in keyed if entry[:2] < position]
+            else:
+                keyed = [entry for entry in keyed if entry[:2] > position]
+        except TypeError:
+            # Cursor de outra ordenação: recomeçar do início
+            pass
+
+    page = keyed[:limit]
+    next_cursor = encode_cursor(*page[-1][:2]) if len(keyed) > limit else None
+    return [entry[2] for entry in page], next_cursor
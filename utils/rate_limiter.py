@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+# Limites documentados pelo Telegram para um mesmo bot
+GLOBAL_MESSAGES_PER_SECOND = 30  # mensagens por segundo somando todos os chats
+CHAT_MESSAGES_PER_SECOND = 1  # mensagens por segundo em um mesmo chat
+GROUP_MESSAGES_PER_MINUTE = 20  # mensagens por minuto em um mesmo grupo
+
+
+class TokenBucket:
+    """Balde de fichas com reserva antecipada.
+
+    Cada reserva consome uma ficha imediatamente, mesmo que o saldo fique
+    negativo, e informa quanto tempo o chamador deve aguardar. Assim os
+    chamadores concorrentes são atendidos na ordem de chegada sem disputar
+    a mesma ficha.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def reserve(self):
+        """Consome uma ficha e retorna o tempo de espera em segundos"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class TelegramRateLimiter:
+    """Limitador de envios de um bot: um balde global e baldes por chat"""
+
+    def __init__(self, global_rate=GLOBAL_MESSAGES_PER_SECOND,
+                 chat_rate=CHAT_MESSAGES_PER_SECOND,
+                 group_rate_per_minute=GROUP_MESSAGES_PER_MINUTE):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate_per_minute = group_rate_per_minute
+        self.chat_buckets = {}  # {chat_id: [TokenBucket, ...]}
+        self.paused_until = 0.0  # instante (monotonic) até o qual os envios estão suspensos
+
+    def _buckets_for(self, chat_id):
+        buckets = self.chat_buckets.get(chat_id)
+        if buckets is None:
+            buckets = [TokenBucket(self.chat_rate, 1)]
+            # IDs negativos são grupos/canais, que têm um limite por minuto
+            if str(chat_id).startswith('-'):
+                buckets.append(TokenBucket(self.group_rate_per_minute / 60.0, self.group_rate_per_minute))
+            self.chat_buckets[chat_id] = buckets
+        return buckets
+
+    def pause(self, seconds):
+        """Suspende todos os envios do bot (ex.: flood wait informado pelo Telegram)"""
+        until = time.monotonic() + seconds
+        if until > self.paused_until:
+            self.paused_until = until
+
+    async def _wait_pause(self):
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def acquire(self, chat_id):
+        """Aguarda até que uma mensagem possa ser enviada para o chat"""
+        await self._wait_pause()
+        delay = max(bucket.reserve() for bucket in self._buckets_for(chat_id))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.global_bucket.acquire()
+        # Uma pausa pode ter começado enquanto aguardávamos a ficha
+        await self._wait_pause()
@@ -0,0 +1,75 @@
+import asyncio
+import random
+import time
+from src.utils.scheduler import DeadlineScheduler
+
+# Parâmetros do backoff exponencial para falhas transitórias
+RETRY_BASE_DELAY_SECONDS = 2
+RETRY_MAX_DELAY_SECONDS = 300
+RETRY_MAX_ATTEMPTS = 5
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY_SECONDS, cap=RETRY_MAX_DELAY_SECONDS):
+    """Calcula o atraso da tentativa (1, 2, ...) com backoff exponencial e jitter.
+
+    Metade do atraso é fixa e a outra metade é sorteada, para que vários
+    grupos que falharam juntos não voltem a tentar no mesmo instante.
+    """
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryQueue:
+    """Fila de reenvios pendentes de um bot, ordenada pelo horário da próxima tentativa.
+
+    Cada par (post_id, chat_id) tem no máximo uma tentativa agendada. Deve ser
+    usada apenas de dentro do event loop do bot.
+    """
+
+    def __init__(self):
+        self.schedule = DeadlineScheduler()
+        self.attempts = {}  # {(post_id, chat_id): número da próxima tentativa}
+        self.tasks = set()  # tentativas em andamento
+        self.changed = asyncio.Event()
+
+    def push(self, post_id, chat_id, delay, attempt):
+        """Agenda uma nova tentativa para o grupo após `delay` segundos"""
+        key = (post_id, chat_id)
+        self.attempts[key] = attempt
+        self.schedule.schedule(key, time.time() + delay)
+        self.changed.set()
+
+    def discard_post(self, post_id):
+        """Remove as tentativas pendentes de uma publicação"""
+        for key in self.schedule.keys():
+            if key[0] == post_id:
+                self.schedule.cancel(key)
+                self.attempts.pop(key, None)
+
+    def pop_due(self, now):
+        """Retorna as tentativas vencidas como (post_id, chat_id, tentativa)"""
+        return [(post_id, chat_id, self.attempts.pop((post_id, chat_id), 1))
+                for post_id, chat_id in self.schedule.pop_due(now)]
+
+    def track(self, task):
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def wait(self):
+        """Aguarda até a próxima tentativa vencer ou uma nova ser agendada"""
+        next_due = self.schedule.next_due()
+        timeout = max(next_due - time.time(), 0) if next_due is not None else None
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+    async def close(self):
+        """Cancela as tentativas em andamento"""
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def __len__(self):
+        return len(self.schedule)
@@ -0,0 +1,63 @@
+import heapq
+import itertools
+
+
+class DeadlineScheduler:
+    """Fila de prazos (min-heap) indexada por chave.
+
+    Cada chave possui no máximo um prazo ativo. Reagendar ou cancelar uma
+    chave apenas invalida a entrada antiga no heap, que é descartada
+    quando chega ao topo (remoção preguiçosa).
+    """
+
+    def __init__(self):
+        self._heap = []  # [(prazo, sequência, chave)]
+        self._entries = {}  # {chave: (prazo, sequência)}
+        self._counter = itertools.count()
+
+    def schedule(self, key, due):
+        """Agenda (ou reagenda) a chave para o timestamp informado"""
+        seq = next(self._counter)
+        self._entries[key] = (due, seq)
+        heapq.heappush(self._heap, (due, seq, key))
+
+    def cancel(self, key):
+        """Remove o prazo ativo de uma chave, se houver"""
+        return self._entries.pop(key, None) is not None
+
+    def due_of(self, key):
+        """Retorna o prazo ativo de uma chave ou None"""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def _discard_stale(self):
+        while self._heap:
+            due, seq, key = self._heap[0]
+            if self._entries.get(key) == (due, seq):
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        """Retorna o prazo mais próximo ou None se a fila estiver vazia"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove e retorna, em ordem de prazo, as chaves vencidas até `now`"""
+        due_keys = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due_keys
+            _, _, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            due_keys.append(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
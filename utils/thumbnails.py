@@ -0,0 +1,168 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from src.utils.file_upload import UPLOAD_FOLDER
+
+logger = logging.getLogger(__name__)
+
+# Miniaturas (fotos, pelo Pillow) e quadros de capa (vídeos, pelo ffmpeg, se
+# instalado), em JPEG: <arquivo>.jpg
+THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, '.thumbs')
+
+# Caixa em que a miniatura cabe, mantendo a proporção
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 80
+
+# Threads que geram as miniaturas em segundo plano
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', '2'))
+
+# Tempo máximo do ffmpeg para extrair um quadro (segundos)
+FFMPEG_TIMEOUT_SECONDS = 30
+
+# Instante do vídeo usado como capa; vídeos mais curtos usam o primeiro quadro
+POSTER_OFFSET_SECONDS = 1
+
+FFMPEG = shutil.which('ffmpeg')
+
+
+def thumbnail_path(filename):
+    return os.path.join(THUMBNAIL_FOLDER, f"{filename}.jpg")
+
+
+def is_fresh(filename):
+    """Indica se a miniatura existe e é mais nova que o arquivo de origem"""
+    try:
+        return os.path.getmtime(thumbnail_path(filename)) >= os.path.getmtime(os.path.join(UPLOAD_FOLDER, filename))
+    except OSError:
+        return False
+
+
+def can_build(file_type):
+    """Indica se há ferramenta disponível para gerar a miniatura deste tipo de mídia"""
+    if file_type == 'photo':
+        return True
+    if file_type == 'video':
+        return FFMPEG is not None
+    return False
+
+
+def _resize_with_pillow(source, target):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target, 'JPEG', quality=THUMBNAIL_QUALITY)
+
+
+def _extract_with_ffmpeg(source, target, offset=0):
+    width, height = THUMBNAIL_SIZE
+    subprocess.run(
+        [FFMPEG, '-v', 'error', '-y', '-ss', str(offset), '-i', source, '-frames:v', '1',
+         '-vf', f"scale=w={width}:h={height}:force_original_aspect_ratio=decrease",
+         '-f', 'image2', '-c:v', 'mjpeg', target],
+        check=True, timeout=FFMPEG_TIMEOUT_SECONDS,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+
+
+def build_thumbnail(filename, file_type):
+    """Gera a miniatura de um arquivo da pasta de uploads; retorna o caminho ou None"""
+    source = os.path.join(UPLOAD_FOLDER, filename)
+    os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+    # Gravada com outro nome e renomeada: quem serve a miniatura nunca vê um arquivo pela metade
+    temp_path = os.path.join(THUMBNAIL_FOLDER, f".{uuid.uuid4().hex}.jpg")
+    try:
+        if file_type == 'photo':
+            _resize_with_pillow(source, temp_path)
+        else:
+            _extract_with_ffmpeg(source, temp_path, POSTER_OFFSET_SECONDS)
+            if not os.path.getsize(temp_path):
+                _extract_with_ffmpeg(source, temp_path)
+        os.replace(temp_path, thumbnail_path(filename))
+        return thumbnail_path(filename)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"ffmpeg não gerou a miniatura de {filename}: {e.stderr.decode(errors='replace').strip()}")
+    except Exception as e:
+        logger.warning(f"Erro ao gerar a miniatura de {filename}: {e}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return None
+
+
+class ThumbnailPool:
+    """Gera miniaturas em segundo plano, sem atrasar o upload ou a página da biblioteca.
+
+    Cada arquivo entra na fila uma única vez enquanto aguarda a vez; as
+    miniaturas já atualizadas não são geradas de novo.
+    """
+
+    def __init__(self, workers=THUMBNAIL_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='thumbnails')
+        self.lock = threading.Lock()
+        self.pending = set()  # arquivos na fila ou em geração
+
+    def _run(self, filename, file_type):
+        try:
+            if not is_fresh(filename):
+                build_thumbnail(filename, file_type)
+        finally:
+            with self.lock:
+                self.pending.discard(filename)
+
+    def schedule(self, filename, file_type):
+        """Enfileira a geração da miniatura; retorna False se não houver o que fazer"""
+        if not can_build(file_type):
+            return False
+        with self.lock:
+            if filename in self.pending:
+                return True
+            self.pending.add(filename)
+        self.executor.submit(self._run, filename, file_type)
+        return True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_thumbnail_pool():
+    """Fila de miniaturas do processo, criada no primeiro uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThumbnailPool()
+        return _pool
+
+
+def schedule_thumbnail(filename, file_type):
+    return get_thumbnail_pool().schedule(filename, file_type)
+
+
+def find_thumbnail(filename, file_type):
+    """Caminho da miniatura atualizada, ou None se ela ainda não existir.
+
+    Fotos sem miniatura são reduzidas na hora (é rápido e evita servir o
+    original); a capa de vídeos é enfileirada e fica para a próxima consulta.
+    """
+    if is_fresh(filename):
+        return thumbnail_path(filename)
+    if file_type == 'photo':
+        return build_thumbnail(filename, file_type)
+    schedule_thumbnail(filename, file_type)
+    return None
+
+
+def delete_thumbnail(filename):
+    """Descarta a miniatura de um arquivo excluído"""
+    try:
+        os.remove(thumbnail_path(filename))
+        return True
+    except FileNotFoundError:
+        return False
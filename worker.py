@@ -0,0 +1,62 @@
+# Processo do agendador, sem o Flask: `python -m src.worker`.
+#
+# Importa apenas o serviço do bot e o armazenamento, obtém o lock de envio,
+# retoma os bots ativos e atende o socket de controle usado pelos processos
+# do Flask (SCHEDULER_MODE=external). Ao receber SIGTERM ou SIGINT, para de
+# iniciar envios, aguarda os que estão em andamento e grava o estado.
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+# Permitir `python -m src.worker` a partir do diretório acima do projeto e `python worker.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.control_plane import CONTROL_SOCKET_NAME, SENDER_LOCK_NAME, ControlServer, SenderLock
+from src.storage import DEFAULT_DATA_DIR
+from src.telegram_bot_service import DRAIN_TIMEOUT_SECONDS, TelegramBotService
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker(data_dir, drain_timeout=DRAIN_TIMEOUT_SECONDS):
+    """Executa o agendador até receber SIGTERM ou SIGINT; retorna o código de saída"""
+    sender_lock = SenderLock(os.path.join(data_dir, SENDER_LOCK_NAME))
+    if not sender_lock.acquire():
+        logger.error(f"O agendador já está em execução (PID {sender_lock.owner_pid()})")
+        return 1
+
+    service = TelegramBotService(data_dir)
+    server = ControlServer(service, os.path.join(data_dir, CONTROL_SOCKET_NAME))
+    server.start()
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    service.resume_active_bots()
+    logger.info(f"Agendador em execução (PID {os.getpid()})")
+    while not stop.wait(1):
+        pass
+
+    logger.info("Encerrando o agendador")
+    server.close()
+    service.shutdown(drain_timeout)
+    logger.info("Agendador encerrado")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agendador de publicações do Telegram, sem a interface web")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="diretório de dados (padrão: o diretório data do projeto)")
+    parser.add_argument('--drain-timeout', type=float, default=DRAIN_TIMEOUT_SECONDS,
+                        help="segundos de espera pelos envios em andamento ao encerrar")
+    args = parser.parse_args(argv)
+    return run_worker(os.path.abspath(args.data_dir), args.drain_timeout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())